@@ -89,6 +89,21 @@ ${text}
 `
 };
 
+/**
+ * Parse a JSON reply. JSON mode normally returns bare JSON; if a reply still
+ * arrives wrapped in a ```json fence, strip only the leading/trailing fence
+ * (anchored, so backticks inside the JSON are left alone) and parse again.
+ */
+function parseJsonResponse(text) {
+  try {
+    return JSON.parse(text);
+  } catch (error) {
+    const body = text.trim().replace(/^```(?:json)?\s*/i, '').replace(/\s*```$/, '');
+    if (body === text.trim()) throw error;
+    return JSON.parse(body);
+  }
+}
+
 function sleep(ms) {
   return new Promise(resolve => setTimeout(resolve, ms));
 }
@@ -152,17 +167,16 @@ async function extractTextFromPDF(buffer) {
 }
 
 async function extractWithGemini(text, promptType) {
-  const model = genAI.getGenerativeModel({ model: 'gemini-2.0-flash' });
+  const model = genAI.getGenerativeModel({
+    model: 'gemini-2.0-flash',
+    generationConfig: { responseMimeType: 'application/json' }
+  });
   stats.apiCalls++;
   
   try {
     const result = await model.generateContent(PROMPTS[promptType](text));
     const response = await result.response;
-    let responseText = response.text();
-    
-    // Clean up response
-    responseText = responseText.replace(/```json\n?/g, '').replace(/```\n?/g, '').trim();
-    return JSON.parse(responseText);
+    return parseJsonResponse(response.text());
   } catch (error) {
     console.error(`    ⚠️ Extraction error: ${error.message}`);
     return null;
@@ -26,7 +26,10 @@ const CONFIG = {
 
 const supabase = createClient(CONFIG.SUPABASE_URL, CONFIG.SUPABASE_KEY);
 const genAI = new GoogleGenerativeAI(CONFIG.GEMINI_API_KEY);
-const model = genAI.getGenerativeModel({ model: 'gemini-2.0-flash' });
+const model = genAI.getGenerativeModel({
+  model: 'gemini-2.0-flash',
+  generationConfig: { responseMimeType: 'application/json' }
+});
 
 // Ensure desktop results folder exists
 if (!fs.existsSync(CONFIG.DESKTOP_PATH)) {
@@ -164,10 +167,9 @@ async function callGemini(prompt, maxRetries = 3) {
       const outputTokenEstimate = Math.ceil(text.length / 4);
       batchStats.outputTokens += outputTokenEstimate;
       
-      const jsonMatch = text.match(/\[[\s\S]*\]|\{[\s\S]*\}/);
-      if (jsonMatch) return JSON.parse(jsonMatch[0]);
-      return null;
+      return JSON.parse(text);
     } catch (error) {
+      if (error instanceof SyntaxError) return null; // Unparseable reply: skip this page
       if (error.message.includes('429') || error.message.includes('quota')) {
         console.log(`   ⏳ Rate limited, waiting ${30 * (attempt + 1)}s...`);
         await delay(30000 * (attempt + 1));
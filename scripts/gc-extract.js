@@ -28,7 +28,10 @@ const CONFIG = {
 
 const supabase = createClient(CONFIG.SUPABASE_URL, CONFIG.SUPABASE_KEY);
 const genAI = new GoogleGenerativeAI(CONFIG.GEMINI_API_KEY);
-const model = genAI.getGenerativeModel({ model: 'gemini-2.0-flash' });
+const model = genAI.getGenerativeModel({
+  model: 'gemini-2.0-flash',
+  generationConfig: { responseMimeType: 'application/json' }
+});
 
 // Ensure desktop results folder exists
 if (!fs.existsSync(CONFIG.DESKTOP_PATH)) {
@@ -188,10 +191,9 @@ async function callGemini(prompt, maxRetries = 3) {
       const outputTokenEstimate = Math.ceil(text.length / 4);
       stats.outputTokens += outputTokenEstimate;
       
-      const jsonMatch = text.match(/\[[\s\S]*\]|\{[\s\S]*\}/);
-      if (jsonMatch) return JSON.parse(jsonMatch[0]);
-      return null;
+      return JSON.parse(text);
     } catch (error) {
+      if (error instanceof SyntaxError) return null; // Unparseable reply: skip this page
       if (error.message.includes('429') || error.message.includes('quota')) {
         if (error.message.includes('quota')) {
           console.log('\n🛑 DAILY QUOTA REACHED - Stopping extraction');
@@ -43,6 +43,21 @@ const TEST_MANUAL = TEST_MANUALS[process.argv[2] ? parseInt(process.argv[2]) : 0
 // Initialize Gemini
 const genAI = new GoogleGenerativeAI(GEMINI_API_KEY);
 
+/**
+ * Parse a JSON reply. JSON mode normally returns bare JSON; if a reply still
+ * arrives wrapped in a ```json fence, strip only the leading/trailing fence
+ * (anchored, so backticks inside the JSON are left alone) and parse again.
+ */
+function parseJsonResponse(text) {
+  try {
+    return JSON.parse(text);
+  } catch (error) {
+    const body = text.trim().replace(/^```(?:json)?\s*/i, '').replace(/\s*```$/, '');
+    if (body === text.trim()) throw error;
+    return JSON.parse(body);
+  }
+}
+
 async function downloadPDF(url) {
   console.log('📥 Downloading PDF...');
   const response = await fetch(url);
@@ -89,7 +104,10 @@ async function extractTextFromPDF(buffer) {
 
 async function extractWithGemini(text, extractionType) {
   // Use gemini-2.0-flash (stable, fast, good for extraction)
-  const model = genAI.getGenerativeModel({ model: 'gemini-2.0-flash' });
+  const model = genAI.getGenerativeModel({
+    model: 'gemini-2.0-flash',
+    generationConfig: { responseMimeType: 'application/json' }
+  });
   
   const prompts = {
     // Extract fault codes - improved prompt
@@ -271,13 +289,7 @@ ${text.substring(0, 50000)}
   try {
     const result = await model.generateContent(prompts[extractionType]);
     const response = await result.response;
-    let responseText = response.text();
-    
-    // Clean up response - remove markdown code blocks if present
-    responseText = responseText.replace(/```json\n?/g, '').replace(/```\n?/g, '').trim();
-    
-    // Parse JSON
-    const parsed = JSON.parse(responseText);
+    const parsed = parseJsonResponse(response.text());
     console.log(`✅ ${extractionType} extraction complete`);
     return parsed;
     
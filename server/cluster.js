@@ -0,0 +1,57 @@
+/**
+ * Cluster Entrypoint
+ * Runs WEB_CONCURRENCY server processes (default 2) behind a shared port,
+ * so concurrent chat requests are not bound to a single event loop.
+ *
+ * Per-process state is not shared between workers: each worker keeps its own
+ * rate limit counters (a client can reach up to workerCount times the configured
+ * limit across connections), and SessionManager's in-memory fallback only holds
+ * sessions written by that worker.
+ */
+
+import cluster from 'cluster';
+
+const DEFAULT_WORKERS = 2;
+const CRASH_WINDOW_MS = 60 * 1000;
+const MAX_CRASHES_PER_WINDOW = 5;
+const MAX_RESTART_DELAY_MS = 30 * 1000;
+
+const workerCount = Math.max(1, parseInt(process.env.WEB_CONCURRENCY, 10) || DEFAULT_WORKERS);
+
+if (cluster.isPrimary) {
+  console.log(`[Cluster] Primary ${process.pid} starting ${workerCount} workers`);
+
+  // Exactly one worker owns the shared background jobs (session cleanup)
+  const roles = new Map();
+  const fork = (role) => {
+    const worker = cluster.fork({ CLUSTER_WORKER_ROLE: role });
+    roles.set(worker.id, role);
+    return worker;
+  };
+
+  for (let i = 0; i < workerCount; i++) {
+    fork(i === 0 ? 'jobs' : 'worker');
+  }
+
+  // Restart crashed workers with exponential backoff; if they keep crashing,
+  // exit so the platform restart policy (Railway ON_FAILURE) takes over
+  let crashes = [];
+  cluster.on('exit', (worker, code, signal) => {
+    const role = roles.get(worker.id) || 'worker';
+    roles.delete(worker.id);
+
+    const now = Date.now();
+    crashes = crashes.filter((t) => now - t < CRASH_WINDOW_MS);
+    crashes.push(now);
+    if (crashes.length > MAX_CRASHES_PER_WINDOW) {
+      console.error(`[Cluster] ${crashes.length} worker exits within ${CRASH_WINDOW_MS / 1000}s, shutting down`);
+      process.exit(1);
+    }
+
+    const delay = Math.min(MAX_RESTART_DELAY_MS, 1000 * 2 ** (crashes.length - 1));
+    console.error(`[Cluster] Worker ${worker.process.pid} (${role}) exited (${signal || code}), restarting in ${delay}ms`);
+    setTimeout(() => fork(role), delay);
+  });
+} else {
+  await import('./index.js');
+}
@@ -5,6 +5,7 @@
 
 import { createClient } from '@supabase/supabase-js';
 import logger from '../utils/logger.js';
+import { pooledFetch } from '../utils/httpAgent.js';
 
 const supabaseUrl = process.env.SUPABASE_URL;
 const supabaseKey = process.env.SUPABASE_SERVICE_KEY;
@@ -29,7 +30,9 @@ export const supabase = createClient(supabaseUrl, supabaseKey, {
   global: {
     headers: {
       'X-Client-Info': 'boilerbrain-server'
-    }
+    },
+    // Reuse keep-alive sockets to PostgREST instead of a new connection per query
+    fetch: pooledFetch
   },
   // Connection pooling configuration
   realtime: {
@@ -16,6 +16,11 @@ export const CHAT_RATE_LIMIT_MAX_REQUESTS = 10;
 // HTTP timeouts
 export const DEFAULT_HTTP_TIMEOUT_MS = 30000; // 30 seconds
 
+// Outbound HTTP connection pool
+export const HTTP_POOL_MAX_SOCKETS = 30; // Concurrent connections per host, per worker process
+export const HTTP_POOL_MAX_FREE_SOCKETS = 20; // Idle connections kept open
+export const HTTP_POOL_PREWARM_CONNECTIONS = 4; // Opened at startup
+
 // Pagination
 export const DEFAULT_PAGE_LIMIT = 50;
 export const MAX_PAGE_LIMIT = 1000;
@@ -27,6 +32,19 @@ export const OPENAI_MAX_TOKENS_DETAILED = 900;
 export const OPENAI_TEMPERATURE_STANDARD = 0.2;
 export const OPENAI_TEMPERATURE_DETAILED = 0.25;
 
+// LLM response cache
+export const LLM_CACHE_TTL_MS = 60 * 60 * 1000; // 1 hour
+export const LLM_CACHE_MAX_ENTRIES = 500;
+export const LLM_CACHE_MAX_TEMPERATURE = 0.5; // Only cache low-temperature (near-deterministic) calls
+
+// Chat history sent to the LLM
+export const CHAT_HISTORY_RECENT_MESSAGES = 6; // Sent verbatim; older messages are folded into a summary
+export const CHAT_HISTORY_SUMMARY_MAX_TOKENS = 300;
+export const CHAT_HISTORY_MAX_VERBATIM_MESSAGES = 40; // Hard cap while a summary is pending (matches the session window loaded)
+
+// Full-text fault code prefilter (answers strong DB matches without the LLM)
+export const FTS_PREFILTER_MIN_RANK = 0.5; // Share of descriptive question terms found in the row (0..1)
+
 // Tool iteration limits
 export const MAX_TOOL_ITERATIONS = 4;
 
@@ -49,6 +67,9 @@ export default {
   CHAT_RATE_LIMIT_WINDOW_MS,
   CHAT_RATE_LIMIT_MAX_REQUESTS,
   DEFAULT_HTTP_TIMEOUT_MS,
+  HTTP_POOL_MAX_SOCKETS,
+  HTTP_POOL_MAX_FREE_SOCKETS,
+  HTTP_POOL_PREWARM_CONNECTIONS,
   DEFAULT_PAGE_LIMIT,
   MAX_PAGE_LIMIT,
   OPENAI_MODEL,
@@ -56,6 +77,13 @@ export default {
   OPENAI_MAX_TOKENS_DETAILED,
   OPENAI_TEMPERATURE_STANDARD,
   OPENAI_TEMPERATURE_DETAILED,
+  LLM_CACHE_TTL_MS,
+  LLM_CACHE_MAX_ENTRIES,
+  LLM_CACHE_MAX_TEMPERATURE,
+  CHAT_HISTORY_RECENT_MESSAGES,
+  CHAT_HISTORY_SUMMARY_MAX_TOKENS,
+  CHAT_HISTORY_MAX_VERBATIM_MESSAGES,
+  FTS_PREFILTER_MIN_RANK,
   MAX_TOOL_ITERATIONS,
   DEFAULT_PORT,
   GAS_EMERGENCY_NUMBER,
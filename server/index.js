@@ -12,6 +12,12 @@ import logger from './utils/logger.js';
 import EnhancedFaultCodeService from './services/EnhancedFaultCodeService.js';
 import SessionManager from './services/SessionManager.js';
 import AgentTools from './services/AgentTools.js';
+import SemanticCache from './services/SemanticCache.js';
+import HistorySummarizer from './services/HistorySummarizer.js';
+import cache from './utils/cache.js';
+import llmCache, { configureLLMCache } from './utils/llmCache.js';
+import { httpsAgent, pooledFetch, prewarmConnections } from './utils/httpAgent.js';
+import { ilikeContains, orIlikeContains, orIlikeContainsEach } from './utils/postgrestFilter.js';
 import { randomUUID } from 'crypto';
 import { validateChatMessage, validateManualSearch, validateRequest } from './middleware/inputValidation.js';
 import * as CONSTANTS from './constants/index.js';
@@ -26,9 +32,13 @@ dotenv.config({ path: path.resolve(__dirname, '.env') });
 // Initialize Supabase client (backend uses SERVICE_KEY for full access)
 const supabase = createClient(
   process.env.SUPABASE_URL,
-  process.env.SUPABASE_SERVICE_KEY
+  process.env.SUPABASE_SERVICE_KEY,
+  { global: { fetch: pooledFetch } }
 );
 
+// Configure the shared LLM response cache once, before any endpoint runs
+configureLLMCache({ client: supabase });
+
 const app = express();
 
 // Railway detection and PORT configuration
@@ -52,6 +62,10 @@ if (process.env.RAILWAY_STATIC_URL) {
 }
 
 // Rate limiting configuration using constants
+// Counters live in each process. Under cluster.js a keep-alive connection stays on
+// one worker, so a client normally sees the configured limit; one spreading requests
+// over several connections can reach up to WEB_CONCURRENCY times it
+
 const apiLimiter = rateLimit({
   windowMs: CONSTANTS.RATE_LIMIT_WINDOW_MS,
   max: CONSTANTS.RATE_LIMIT_MAX_REQUESTS,
@@ -154,11 +168,11 @@ app.get('/api/manuals', validateManualSearch, async (req, res) => {
     let query = supabase.from('boiler_manuals').select('*', { count: 'exact' });
     
     if (manufacturer) {
-      query = query.ilike('manufacturer', `%${manufacturer}%`);
+      query = query.ilike('manufacturer', ilikeContains(manufacturer));
     }
     
     if (search) {
-      query = query.or(`name.ilike.%${search}%,manufacturer.ilike.%${search}%,gc_number.ilike.%${search}%`);
+      query = query.or(orIlikeContains(['name', 'manufacturer', 'gc_number'], search));
     }
     
     query = query.range(offset, offset + limit - 1).order('manufacturer', { ascending: true });
@@ -367,10 +381,13 @@ app.get('/api/manuals/:id/download', async (req, res) => {
 // --- GET /api/manufacturers ---
 app.get('/api/manufacturers', async (req, res) => {
   try {
-    const { data, error } = await supabase.from('manufacturers').select('name').order('name');
-    if (error) throw error;
-    // Extract unique manufacturer names
-    const manufacturers = [...new Set((data || []).map(m => m.name))].sort();
+    // The list changes rarely; serve it from memory and refresh at most every CACHE_TIMEOUT_MS
+    const manufacturers = await cache.getOrSet('manufacturers:names', async () => {
+      const { data, error } = await supabase.from('manufacturers').select('name').order('name');
+      if (error) throw error;
+      // Extract unique manufacturer names
+      return [...new Set((data || []).map(m => m.name))].sort();
+    });
     res.json({ manufacturers });
   } catch (err) {
     res.status(500).json({ error: err.message });
@@ -392,6 +409,104 @@ app.get('/api/user', (req, res) => {
   res.status(501).json({ error: 'User profile API not implemented. Use Supabase Auth.' });
 });
 
+// Static system prompt for /api/chat. Kept free of per-request data so consecutive
+// requests share the same prefix for OpenAI prompt caching
+const CHAT_SYSTEM_PROMPT = `IDENTITY & EXPERTISE:
+You are a Master Gas Safe registered engineer with 25+ years of hands-on experience. You've diagnosed thousands of boiler faults across all major manufacturers. You're known for:
+- Getting to the root cause quickly and methodically
+- Explaining the "why" not just the "what"
+- Sharing practical field experience and patterns
+- Never wasting time on unlikely causes
+- Being decisive based on probability
+- Knowing manufacturer-specific quirks
+
+IMPORTANT: You're talking to a FELLOW GAS SAFE REGISTERED ENGINEER. They have the skills, tools, and qualifications to fix anything. NEVER suggest calling support or getting help - guide them through the fix. They just need your experience and systematic approach.
+
+COMMUNICATION STYLE:
+- Talk like you're on-site with a colleague, not writing a manual
+- Use "we" and "let's" (collaborative)
+- Share context: "I've seen this pattern on Ideals before..."
+- Give reasoning: "We check X first because..."
+- Be decisive: "This is almost certainly..." not "it might be..."
+- Natural engineer shorthand when appropriate
+- Acknowledge frustration: "I know, these can be fiddly..."
+- Celebrate progress: "Right, that's a good sign..."
+- Use conversational openers: "Right, so..." "OK, let's think through this..."
+
+SYSTEM TYPES (critical for diagnostics):
+- COMBI: Single unit, instant hot water, sealed system
+- SYSTEM: Separate cylinder, sealed heating, pressurised
+- REGULAR: Open vented, cold water tank, gravity fed
+
+DIAGNOSTIC APPROACH:
+
+[ASSESSMENT] (1-2 sentences - what this likely is)
+"Right, L2 on an Ideal Logic is classic ignition lockout after 3 attempts..."
+
+[CONTEXT] (Brief WHY)
+"Usually gas supply, electrode position, or occasionally the PCB. Nine times out of ten it's something simple."
+
+[ACTIONS] (Prioritized by probability)
+1. Check gas valve fully open
+2. Electrode gap while you're there - should be 3-4mm
+3. Look for loose PCB connections
+
+[INDICATORS] (What each result tells us)
+✓ Fires after gas valve check → supply issue sorted
+✓ Sparking but no flame → electrode gap or gas pressure  
+✗ No spark at all → igniter or PCB connection
+
+[FOLLOW-UP] (Specific, contextual)
+"What's happening when you hit reset - getting spark? Hear gas flowing?"
+
+SAFETY COMMUNICATION:
+- Natural, not robotic: "Right, if you're smelling gas, we stop here. Turn off at meter, get ventilation, call emergency line (0800 111 999). I know it's frustrating mid-job, but can't risk it."
+- Include reasoning, not just rules
+- Emergency numbers when genuinely needed
+- But remember: they're qualified to handle it
+
+KEY PATTERNS:
+- Opening: "Right, so..." "OK, let's..." "Interesting one..."
+- Explaining: "Here's the thing..." "What we're looking at..."
+- Experience: "Nine times out of ten..." "I've seen this before when..."
+- Action: "Let's check..." "Quick test..."
+- Reasoning: "That tells us..." "Which means..."
+
+MANUFACTURER KNOWLEDGE:
+- Include quirks: "Ideals are known for..." "Worcester F22 usually..."
+- Common patterns from experience
+- Tool requirements upfront
+- Part numbers when helpful
+- Installation gotchas
+
+CRITICAL RULES:
+1. Model numbers (24, 28, 30) are kW ratings, NOT fault codes
+2. Use ONLY database info when provided (marked [MANUFACTURER DATABASE INFORMATION])
+3. Never suggest "contact support" or "seek help" - they ARE the expert
+4. Every response ends with specific follow-up question
+5. Always explain WHY, not just WHAT
+6. Adapt complexity to their demonstrated skill level
+7. Share relevant experience patterns
+8. KNOWLEDGE CURRENCY: You have UP-TO-DATE boiler knowledge. NEVER mention "training cutoff", "October 2023", "my knowledge ends at", or any date limitations. If asked about your training/knowledge, say: "I have comprehensive, current knowledge of all major boiler systems. What do you need help with?"
+
+FORBIDDEN:
+- "You might want to call manufacturer support" ❌
+- "Contact a qualified engineer" ❌ (THEY ARE ONE!)
+- "If unsure, seek assistance" ❌
+- Generic endings without specific questions ❌
+- Textbook responses without context ❌
+- "It could be several things" (be decisive!) ❌
+- Time estimates in action steps ❌
+- "Sources:" section or references ❌ (integrate info naturally)
+- NEVER say "since you mentioned X" or "you said X" unless they ACTUALLY did ❌
+- NEVER make assumptions about readings or checks they haven't explicitly stated ❌
+- NEVER mention "October 2023", "training cutoff", "my knowledge is limited to", or ANY date limitations ❌
+- NEVER say "I was trained up to" or discuss AI training dates ❌
+
+CRITICAL: Only reference what the user ACTUALLY provided. If they said "F22" but didn't mention pressure, DON'T say "since the pressure is fine". ASK: "What's the pressure reading?"
+
+Remember: You're the experienced engineer they're consulting. Be confident, practical, and guide them to the fix.`;
+
 app.post('/api/chat', chatLimiter, validateChatMessage, async (req, res) => {
   try {
     const { message, sessionId, history, detail } = req.body;
@@ -405,18 +520,20 @@ app.post('/api/chat', chatLimiter, validateChatMessage, async (req, res) => {
       chatHistory = session.history || [];
       console.log(`[Chat] Restored session from database with ${chatHistory.length} messages`);
     } else if (Array.isArray(history) && history.length > 0) {
-      // Create new session with provided history
+      // New session seeded with provided history (row is created by the upsert when the turn is saved)
       chatHistory = history;
-      await SessionManager.createSession(sessionId, null, chatHistory);
-      console.log(`[Chat] Created new session with ${chatHistory.length} messages`);
+      console.log(`[Chat] Starting new session with ${chatHistory.length} messages`);
     } else if (message && sessionId) {
-      // Create new session with initial message
+      // New empty session (row is created by the upsert when the turn is saved)
       chatHistory = [];
-      await SessionManager.createSession(sessionId, null, chatHistory);
-      console.log(`[Chat] Created new empty session`);
+      console.log(`[Chat] Starting new empty session`);
     } else {
       return res.status(400).json({ error: 'Missing message or chat history' });
     }
+
+    // Messages already stored; only the ones after this index are appended when the turn is saved
+    const persistedLength = session ? chatHistory.length : 0;
+    const historyContext = HistorySummarizer.contextFor(session, persistedLength);
     
     // Add current user message to history BEFORE processing
     chatHistory.push({ 
@@ -522,8 +639,8 @@ app.post('/api/chat', chatLimiter, validateChatMessage, async (req, res) => {
             const { data: manuals, error: manualError } = await supabase
               .from('boiler_manuals')
               .select('name, url, manufacturer')
-              .ilike('manufacturer', `%${faultInfo.manufacturer}%`)
-              .or(`name.ilike.%${modelKeywords}%,name.ilike.%${faultInfo.manufacturer}%`)
+              .ilike('manufacturer', ilikeContains(faultInfo.manufacturer))
+              .or(orIlikeContainsEach([['name', modelKeywords], ['name', faultInfo.manufacturer]]))
               .limit(3);
             
             if (manuals && manuals.length > 0) {
@@ -632,114 +749,19 @@ app.post('/api/chat', chatLimiter, validateChatMessage, async (req, res) => {
     // Note: tools array removed as it was unused dead code
   }
 
-  // Prepare messages for OpenAI with enhanced lead engineer prompt
-  const messages = [
-    {
-      role: 'system',
-      content: `IDENTITY & EXPERTISE:
-You are a Master Gas Safe registered engineer with 25+ years of hands-on experience. You've diagnosed thousands of boiler faults across all major manufacturers. You're known for:
-- Getting to the root cause quickly and methodically
-- Explaining the "why" not just the "what"
-- Sharing practical field experience and patterns
-- Never wasting time on unlikely causes
-- Being decisive based on probability
-- Knowing manufacturer-specific quirks
-
-IMPORTANT: You're talking to a FELLOW GAS SAFE REGISTERED ENGINEER. They have the skills, tools, and qualifications to fix anything. NEVER suggest calling support or getting help - guide them through the fix. They just need your experience and systematic approach.
-
-COMMUNICATION STYLE:
-- Talk like you're on-site with a colleague, not writing a manual
-- Use "we" and "let's" (collaborative)
-- Share context: "I've seen this pattern on Ideals before..."
-- Give reasoning: "We check X first because..."
-- Be decisive: "This is almost certainly..." not "it might be..."
-- Natural engineer shorthand when appropriate
-- Acknowledge frustration: "I know, these can be fiddly..."
-- Celebrate progress: "Right, that's a good sign..."
-- Use conversational openers: "Right, so..." "OK, let's think through this..."
-
-SYSTEM TYPES (critical for diagnostics):
-- COMBI: Single unit, instant hot water, sealed system
-- SYSTEM: Separate cylinder, sealed heating, pressurised
-- REGULAR: Open vented, cold water tank, gravity fed
-
-DIAGNOSTIC APPROACH:
-
-[ASSESSMENT] (1-2 sentences - what this likely is)
-"Right, L2 on an Ideal Logic is classic ignition lockout after 3 attempts..."
-
-[CONTEXT] (Brief WHY)
-"Usually gas supply, electrode position, or occasionally the PCB. Nine times out of ten it's something simple."
-
-[ACTIONS] (Prioritized by probability)
-1. Check gas valve fully open
-2. Electrode gap while you're there - should be 3-4mm
-3. Look for loose PCB connections
-
-[INDICATORS] (What each result tells us)
-✓ Fires after gas valve check → supply issue sorted
-✓ Sparking but no flame → electrode gap or gas pressure  
-✗ No spark at all → igniter or PCB connection
-
-[FOLLOW-UP] (Specific, contextual)
-"What's happening when you hit reset - getting spark? Hear gas flowing?"
-
-SAFETY COMMUNICATION:
-- Natural, not robotic: "Right, if you're smelling gas, we stop here. Turn off at meter, get ventilation, call emergency line (0800 111 999). I know it's frustrating mid-job, but can't risk it."
-- Include reasoning, not just rules
-- Emergency numbers when genuinely needed
-- But remember: they're qualified to handle it
-
-KEY PATTERNS:
-- Opening: "Right, so..." "OK, let's..." "Interesting one..."
-- Explaining: "Here's the thing..." "What we're looking at..."
-- Experience: "Nine times out of ten..." "I've seen this before when..."
-- Action: "Let's check..." "Quick test..."
-- Reasoning: "That tells us..." "Which means..."
-
-MANUFACTURER KNOWLEDGE:
-- Include quirks: "Ideals are known for..." "Worcester F22 usually..."
-- Common patterns from experience
-- Tool requirements upfront
-- Part numbers when helpful
-- Installation gotchas
-
-CRITICAL RULES:
-1. Model numbers (24, 28, 30) are kW ratings, NOT fault codes
-2. Use ONLY database info when provided (marked [MANUFACTURER DATABASE INFORMATION])
-3. Never suggest "contact support" or "seek help" - they ARE the expert
-4. Every response ends with specific follow-up question
-5. Always explain WHY, not just WHAT
-6. Adapt complexity to their demonstrated skill level
-7. Share relevant experience patterns
-8. KNOWLEDGE CURRENCY: You have UP-TO-DATE boiler knowledge. NEVER mention "training cutoff", "October 2023", "my knowledge ends at", or any date limitations. If asked about your training/knowledge, say: "I have comprehensive, current knowledge of all major boiler systems. What do you need help with?"
-
-FORBIDDEN:
-- "You might want to call manufacturer support" ❌
-- "Contact a qualified engineer" ❌ (THEY ARE ONE!)
-- "If unsure, seek assistance" ❌
-- Generic endings without specific questions ❌
-- Textbook responses without context ❌
-- "It could be several things" (be decisive!) ❌
-- Time estimates in action steps ❌
-- "Sources:" section or references ❌ (integrate info naturally)
-- NEVER say "since you mentioned X" or "you said X" unless they ACTUALLY did ❌
-- NEVER make assumptions about readings or checks they haven't explicitly stated ❌
-- NEVER mention "October 2023", "training cutoff", "my knowledge is limited to", or ANY date limitations ❌
-- NEVER say "I was trained up to" or discuss AI training dates ❌
-
-CRITICAL: Only reference what the user ACTUALLY provided. If they said "F22" but didn't mention pressure, DON'T say "since the pressure is fine". ASK: "What's the pressure reading?"
-
-${relevantKnowledge ? '⚠️ MANUFACTURER DATABASE - USE THIS EXACT INFO:\n' + relevantKnowledge + '\n\n🔒 DATABASE IS AUTHORITATIVE - interpret and explain it naturally.' : ''}
-
-Remember: You're the experienced engineer they're consulting. Be confident, practical, and guide them to the fix.`
-    }
-  ];
+  // Prepare messages for OpenAI: static lead engineer prompt first, per-request
+  // database context at the tail (prepended to the last user message below)
+  const messages = [{ role: 'system', content: CHAT_SYSTEM_PROMPT }];
   
-  // Add conversation history
-  chatHistory.forEach((msg, index) => {
+  // Add conversation history: recent messages verbatim, older ones as a rolling summary
+  const { summary: historySummary, recent: recentHistory } = HistorySummarizer.condense(chatHistory, historyContext);
+  if (historySummary) {
+    messages.push({ role: 'system', content: `Earlier in this conversation: ${historySummary}` });
+  }
+  HistorySummarizer.refresh(sessionId, chatHistory, historyContext);
+  recentHistory.forEach((msg, index) => {
     // For the LAST user message, prepend the database context
-    if (msg.sender === 'user' && index === chatHistory.length - 1 && relevantKnowledge) {
+    if (msg.sender === 'user' && index === recentHistory.length - 1 && relevantKnowledge) {
       messages.push({
         role: 'user',
         content: `==========================================
@@ -747,6 +769,8 @@ Remember: You're the experienced engineer they're consulting. Be confident, prac
 ⚠️ YOU MUST USE THIS INFORMATION ONLY
 ==========================================
 ${relevantKnowledge}
+
+🔒 DATABASE IS AUTHORITATIVE - interpret and explain it naturally.
 ==========================================
 [END DATABASE INFORMATION]
 ==========================================
@@ -789,6 +813,7 @@ ${msg.text}`
       console.log(`[OpenAI] Trying API key #${i+1} with temp=${temperature}`);
       const response = await fetch('https://api.openai.com/v1/chat/completions', {
         method: 'POST',
+        agent: httpsAgent,
         headers: {
           'Authorization': `Bearer ${key}`,
           'Content-Type': 'application/json'
@@ -910,7 +935,7 @@ The "${model}" refers to the power output in kilowatts, not a fault code. Please
           // Skip the rest of the post-processing since we've rewritten the response
           // Save session before responding (user message already added at top)
           chatHistory.push({ sender: 'assistant', text: reply, timestamp: new Date().toISOString() });
-          await SessionManager.updateSession(sessionId, chatHistory);
+          await SessionManager.appendTurns(sessionId, chatHistory.slice(persistedLength));
           return res.json({ reply });
         }
         
@@ -981,8 +1006,8 @@ The "${model}" refers to the power output in kilowatts, not a fault code. Please
               const { data: modelManuals } = await supabase
                 .from('boiler_manuals')
                 .select('name, url, gc_number')
-                .or(`manufacturer.ilike.%${manufacturer}%,name.ilike.%${manufacturer}%`)
-                .ilike('name', `%${modelName}%`)
+                .or(orIlikeContains(['manufacturer', 'name'], manufacturer))
+                .ilike('name', ilikeContains(modelName))
                 .limit(3);
               
               if (modelManuals && modelManuals.length > 0) {
@@ -996,7 +1021,7 @@ The "${model}" refers to the power output in kilowatts, not a fault code. Please
               const { data: generalManuals } = await supabase
                 .from('boiler_manuals')
                 .select('name, url, gc_number')
-                .or(`manufacturer.ilike.%${manufacturer}%,name.ilike.%${manufacturer}%`)
+                .or(orIlikeContains(['manufacturer', 'name'], manufacturer))
                 .limit(3);
               
               if (generalManuals && generalManuals.length > 0) {
@@ -1028,7 +1053,7 @@ The "${model}" refers to the power output in kilowatts, not a fault code. Please
 
         // Save session before responding (user message already added at top)
         chatHistory.push({ sender: 'assistant', text: reply, timestamp: new Date().toISOString() });
-        await SessionManager.updateSession(sessionId, chatHistory);
+        await SessionManager.appendTurns(sessionId, chatHistory.slice(persistedLength));
         
         return res.json({ reply });
       } else {
@@ -1053,6 +1078,44 @@ The "${model}" refers to the power output in kilowatts, not a fault code. Please
   }
 });
 
+// Shared lookup tables and patterns for agent replies, compiled once at startup
+const MANUFACTURER_DISPLAY_NAMES = {
+  'worcester': 'Worcester Bosch',
+  'glow-worm': 'Glow-worm',
+  'viessmann': 'Viessmann',
+  'vaillant': 'Vaillant',
+  'ideal': 'Ideal',
+  'baxi': 'Baxi',
+  'potterton': 'Potterton',
+  'ariston': 'Ariston',
+  'ferroli': 'Ferroli',
+  'alpha': 'Alpha',
+  'ravenheat': 'Ravenheat',
+  'intergas': 'Intergas'
+};
+
+// Lines pointing the engineer elsewhere ("refer to the manual") are stripped from replies
+const INSTRUCTIVE_LINE_PATTERN = /(\brefer to|\bsee|\bcheck|\bconsult|\bvisit|\bread)\b[^\n]{0,160}\b(manual|guide|documentation|docs|website|page|link|bulletin|datasheet|procedure)\b/i;
+
+// Component names picked out of replies for structured "parts"
+const PART_PATTERNS = ['electrode', 'spark generator', 'ignition module', 'gas valve', 'fan', 'pump', 'diverter valve', 'pcb', 'pressure sensor', 'flame sensor', 'thermostat']
+  .map((p) => [p, new RegExp(`\\b${p.replace(/\s+/g, '\\s+')}\\b`, 'i')]);
+
+// Static system prompt for the streaming agent, built once at startup
+const AGENT_STREAM_SYSTEM_PROMPT = `You are a senior Gas Safe engineer assistant.
+Ground responses with tools and keep them brief. Rules:
+1) If a CLEAR fault code is present, call get_fault_info first (use user_text fallback).
+2) Numbers after model names (e.g., "Logic Combi 24/30/35") are kW ratings, NOT fault codes.
+3) For model/system-only inputs (no fault code), begin reply with: "Make: <mfr> | Model: <model> | System: <type>" (omit unknowns). Then ask for the displayed fault code or symptoms. Do NOT diagnose a fault code.
+4) If manufacturer known, call search_manuals (limit 1) and include 1 manual link.
+5) If a fault code present, call get_verified_knowledge (limit 1) and summarize briefly.
+6) If get_fault_info returns modelTips, INCLUDE it early in the reply.
+7) Do NOT include URLs in the body. Only include URLs from tool results in a final 'Sources:' section. Never invent URLs.
+8) Do NOT instruct the user to check/read/see/consult any guide/manual/website. Include necessary procedures directly; 'Sources:' is provenance only.
+9) Prefer manufacturer-specific info; no hallucinated codes/values.
+10) Output: concise and safety-first.
+11) If the user requests diagnostics/procedure/steps, provide a detailed numbered procedure (8–15 steps) using available tool context/procedures, include cautions, and keep it self-contained.`;
+
 // SSE streaming endpoint for detailed diagnostics
 app.get('/api/agent/chat/stream', chatLimiter, async (req, res) => {
   try {
@@ -1064,39 +1127,34 @@ app.get('/api/agent/chat/stream', chatLimiter, async (req, res) => {
     res.setHeader('Cache-Control', 'no-cache, no-transform');
     res.setHeader('Connection', 'keep-alive');
     res.setHeader('X-Accel-Buffering', 'no');
+    // Open the event stream now rather than on the first write
+    res.flushHeaders();
 
     const send = (obj) => res.write(`data: ${JSON.stringify(obj)}\n\n`);
     const end = () => res.end();
 
-    // Restore session history
+    // Restore only recent turns; new turns are appended server-side on save
     let chatHistory = [];
+    let persistedLength = 0;
+    let historyContext = HistorySummarizer.contextFor(null, 0);
     if (sessionId) {
       try {
-        const ses = await SessionManager.getSession(sessionId);
+        const ses = await SessionManager.getRecentSession(sessionId);
         if (ses?.history) chatHistory = ses.history;
+        persistedLength = chatHistory.length;
+        historyContext = HistorySummarizer.contextFor(ses, persistedLength);
       } catch {}
     }
     chatHistory.push({ sender: 'user', text: message, timestamp: new Date().toISOString() });
 
     const extracted = EnhancedFaultCodeService.extractFaultInfo(message) || {};
 
-    // Build system and pre-seed tools similar to non-streaming path
-    const system = `You are a senior Gas Safe engineer assistant.
-Ground responses with tools and keep them brief. Rules:
-1) If a CLEAR fault code is present, call get_fault_info first (use user_text fallback).
-2) Numbers after model names (e.g., "Logic Combi 24/30/35") are kW ratings, NOT fault codes.
-3) For model/system-only inputs (no fault code), begin reply with: "Make: <mfr> | Model: <model> | System: <type>" (omit unknowns). Then ask for the displayed fault code or symptoms. Do NOT diagnose a fault code.
-4) If manufacturer known, call search_manuals (limit 1) and include 1 manual link.
-5) If a fault code present, call get_verified_knowledge (limit 1) and summarize briefly.
-6) If get_fault_info returns modelTips, INCLUDE it early in the reply.
-7) Do NOT include URLs in the body. Only include URLs from tool results in a final 'Sources:' section. Never invent URLs.
-8) Do NOT instruct the user to check/read/see/consult any guide/manual/website. Include necessary procedures directly; 'Sources:' is provenance only.
-9) Prefer manufacturer-specific info; no hallucinated codes/values.
-10) Output: concise and safety-first.
-11) If the user requests diagnostics/procedure/steps, provide a detailed numbered procedure (8–15 steps) using available tool context/procedures, include cautions, and keep it self-contained.`;
-
-    const toOpenAIMessages = [{ role: 'system', content: system }];
-    chatHistory.forEach((m) => toOpenAIMessages.push({ role: m.sender === 'user' ? 'user' : 'assistant', content: m.text }));
+    // Build messages and pre-seed tools similar to non-streaming path
+    const toOpenAIMessages = [{ role: 'system', content: AGENT_STREAM_SYSTEM_PROMPT }];
+    const { summary: historySummary, recent: recentHistory } = HistorySummarizer.condense(chatHistory, historyContext);
+    if (historySummary) toOpenAIMessages.push({ role: 'system', content: `Earlier in this conversation: ${historySummary}` });
+    HistorySummarizer.refresh(sessionId, chatHistory, historyContext);
+    recentHistory.forEach((m) => toOpenAIMessages.push({ role: m.sender === 'user' ? 'user' : 'assistant', content: m.text }));
 
     if (extracted && (extracted.manufacturer || extracted.model || extracted.systemType || extracted.faultCode)) {
       const ctxParts = [];
@@ -1109,59 +1167,49 @@ Ground responses with tools and keep them brief. Rules:
       }
     }
 
+    const preToolCalls = [];
     const preToolResults = [];
-    if (extracted?.manufacturer) {
-      try {
-        const r2 = await AgentTools.search_manuals({ manufacturer: extracted.manufacturer, model: extracted?.model || null, limit: 1 });
-        preToolResults.push({ role: 'tool', tool_call_id: 'pre_2', name: 'search_manuals', content: JSON.stringify(r2) });
-      } catch {}
-    }
-    if ((extracted?.manufacturer || extracted?.model) && !extracted?.faultCode) {
-      try {
-        const r4 = await AgentTools.get_symptom_guidance({ manufacturer: extracted?.manufacturer || null, model: extracted?.model || null, symptoms: String(message || ''), limit: 5 });
-        preToolResults.push({ role: 'tool', tool_call_id: 'pre_4', name: 'get_symptom_guidance', content: JSON.stringify(r4) });
-      } catch {}
-    }
+    // Independent lookups run concurrently; results are appended in a fixed order
+    const settle = (p) => p.then((result) => ({ ok: true, result }), () => ({ ok: false }));
+    const manualsArgs = { manufacturer: extracted?.manufacturer || null, model: extracted?.model || null, limit: 1 };
+    const symptomArgs = { manufacturer: extracted?.manufacturer || null, model: extracted?.model || null, symptoms: String(message || ''), limit: 5 };
+    const faultArgs = { manufacturer: extracted?.manufacturer || null, fault_code: extracted?.faultCode || null, user_text: String(message || '') };
+    const knowledgeArgs = { fault_code: extracted?.faultCode || null, manufacturer: extracted?.manufacturer || null, model: extracted?.model || null, limit: 1 };
+    const [o2, o4, o1, o3] = await Promise.all([
+      extracted?.manufacturer ? settle(AgentTools.search_manuals(manualsArgs)) : null,
+      (extracted?.manufacturer || extracted?.model) && !extracted?.faultCode ? settle(AgentTools.get_symptom_guidance(symptomArgs)) : null,
+      extracted?.faultCode ? settle(AgentTools.get_fault_info(faultArgs)) : null,
+      extracted?.faultCode ? settle(AgentTools.get_verified_knowledge(knowledgeArgs)) : null
+    ]);
+    // Each tool message must answer a tool_call on the preceding assistant message
+    const addPreTool = (id, name, args, result) => {
+      preToolCalls.push({ id, type: 'function', function: { name, arguments: JSON.stringify(args) } });
+      preToolResults.push({ role: 'tool', tool_call_id: id, name, content: JSON.stringify(result) });
+    };
+    if (o2?.ok) addPreTool('pre_2', 'search_manuals', manualsArgs, o2.result);
+    if (o4?.ok) addPreTool('pre_4', 'get_symptom_guidance', symptomArgs, o4.result);
     let modelTipText = '';
-    if (extracted?.faultCode) {
-      try {
-        const r1 = await AgentTools.get_fault_info({ manufacturer: extracted?.manufacturer || null, fault_code: extracted?.faultCode || null, user_text: String(message || '') });
-        preToolResults.push({ role: 'tool', tool_call_id: 'pre_1', name: 'get_fault_info', content: JSON.stringify(r1) });
-        if (r1?.modelTips) modelTipText = String(r1.modelTips);
-      } catch {}
-      try {
-        const r3 = await AgentTools.get_verified_knowledge({ fault_code: extracted.faultCode, manufacturer: extracted?.manufacturer || null, model: extracted?.model || null, limit: 1 });
-        preToolResults.push({ role: 'tool', tool_call_id: 'pre_3', name: 'get_verified_knowledge', content: JSON.stringify(r3) });
-      } catch {}
+    if (o1?.ok) {
+      addPreTool('pre_1', 'get_fault_info', faultArgs, o1.result);
+      if (o1.result?.modelTips) modelTipText = String(o1.result.modelTips);
     }
+    if (o3?.ok) addPreTool('pre_3', 'get_verified_knowledge', knowledgeArgs, o3.result);
+    // Keep the decoded results; tool messages carry the JSON only for the model
+    const preToolData = {
+      search_manuals: o2?.ok ? o2.result : null,
+      get_symptom_guidance: o4?.ok ? o4.result : null,
+      get_fault_info: o1?.ok ? o1.result : null,
+      get_verified_knowledge: o3?.ok ? o3.result : null
+    };
+    const preToolItems = (name) => preToolData[name]?.items || [];
 
     // Build allowed URLs from manuals only
     const allowedUrls = new Set();
-    preToolResults
-      .filter((t) => t.name === 'search_manuals')
-      .forEach((t) => {
-        try {
-          const items = (JSON.parse(t.content || '{}')?.items) || [];
-          items.forEach((m) => { if (m?.url) allowedUrls.add(String(m.url)); });
-        } catch {}
-      });
+    preToolItems('search_manuals').forEach((m) => { if (m?.url) allowedUrls.add(String(m.url)); });
 
     // Model-only flow: emit header immediately and end
     if (!extracted?.faultCode) {
-      const displayMap = {
-        'worcester': 'Worcester Bosch',
-        'glow-worm': 'Glow-worm',
-        'viessmann': 'Viessmann',
-        'vaillant': 'Vaillant',
-        'ideal': 'Ideal',
-        'baxi': 'Baxi',
-        'potterton': 'Potterton',
-        'ariston': 'Ariston',
-        'ferroli': 'Ferroli',
-        'alpha': 'Alpha',
-        'ravenheat': 'Ravenheat',
-        'intergas': 'Intergas'
-      };
+      const displayMap = MANUFACTURER_DISPLAY_NAMES;
       const parts = [];
       if (extracted?.manufacturer) {
         const mfRaw = String(extracted.manufacturer).toLowerCase();
@@ -1181,14 +1229,8 @@ Ground responses with tools and keep them brief. Rules:
       // Append Sources
       let sourcesText = '';
       try {
-        const manuals = preToolResults
-          .filter((t) => t.name === 'search_manuals')
-          .flatMap((t) => { try { return (JSON.parse(t.content || '{}')?.items) || []; } catch { return []; } })
-          .slice(0, 1);
-        const knowledge = preToolResults
-          .filter((t) => t.name === 'get_verified_knowledge')
-          .flatMap((t) => { try { return (JSON.parse(t.content || '{}')?.items) || []; } catch { return []; } })
-          .slice(0, 1);
+        const manuals = preToolItems('search_manuals').slice(0, 1);
+        const knowledge = preToolItems('get_verified_knowledge').slice(0, 1);
         if (manuals.length > 0 || knowledge.length > 0) {
           sourcesText += '\nSources:';
           manuals.forEach((m) => {
@@ -1214,7 +1256,7 @@ Ground responses with tools and keep them brief. Rules:
       const structured = { header: { make, model, system, faultCode: null }, bullets: [], steps: [], cautions: [], parts: [], measurements: [], sources: { manuals: Array.from(allowedUrls).map((u) => ({ type: 'manual', title: 'Manual', manufacturer: make, gc_number: null, url: u })), knowledge: [] } };
       try {
         const historyNow = Array.isArray(chatHistory) ? [...chatHistory, { sender: 'assistant', text: headerText + (sourcesText ? ('\n' + sourcesText) : ''), timestamp: new Date().toISOString() }] : [];
-        if (sessionId) await SessionManager.updateSession(sessionId, historyNow);
+        if (sessionId) await SessionManager.appendTurns(sessionId, historyNow.slice(persistedLength));
       } catch {}
       send({ done: true, structured });
       return end();
@@ -1223,8 +1265,11 @@ Ground responses with tools and keep them brief. Rules:
     // Fault present: stream from OpenAI
     const openaiKeys = [process.env.OPENAI_API_KEY, process.env.OPENAI_API_KEY_2, process.env.OPENAI_API_KEY_3].filter(Boolean);
 
-    // Include preTool results as tool messages
-    preToolResults.forEach((t) => toOpenAIMessages.push(t));
+    // Include preTool results as tool messages, after the assistant turn that requested them
+    if (preToolCalls.length > 0) {
+      toOpenAIMessages.push({ role: 'assistant', content: '', tool_calls: preToolCalls });
+      preToolResults.forEach((t) => toOpenAIMessages.push(t));
+    }
 
     // Model tip preface
     if (modelTipText) send({ delta: `Model tip: ${modelTipText}\n\n` });
@@ -1235,8 +1280,9 @@ Ground responses with tools and keep them brief. Rules:
         try {
           const response = await fetch('https://api.openai.com/v1/chat/completions', {
             method: 'POST',
+            agent: httpsAgent,
             headers: { 'Authorization': `Bearer ${key}`, 'Content-Type': 'application/json' },
-            body: JSON.stringify({ model: 'gpt-4o-mini', messages, stream: true, tool_choice: 'none', temperature: detail ? 0.25 : 0.2, max_tokens: detail ? 900 : 600, frequency_penalty: 0.35, presence_penalty: 0 })
+            body: JSON.stringify({ model: 'gpt-4o-mini', messages, stream: true, temperature: detail ? 0.25 : 0.2, max_tokens: detail ? 900 : 600, frequency_penalty: 0.35, presence_penalty: 0 })
           });
           if (!response.ok) continue;
           return response.body;
@@ -1252,14 +1298,13 @@ Ground responses with tools and keep them brief. Rules:
       return end();
     }
 
-    const reader = stream.getReader();
+    // node-fetch exposes the body as a Node Readable: forward each SSE chunk as it arrives
     const decoder = new TextDecoder('utf-8');
     let buffer = '';
     let finalBody = modelTipText ? `Model tip: ${modelTipText}\n\n` : '';
 
-    while (true) {
-      const { value, done } = await reader.read();
-      if (done) break;
+    readLoop:
+    for await (const value of stream) {
       buffer += decoder.decode(value, { stream: true });
       const parts = buffer.split('\n\n');
       buffer = parts.pop();
@@ -1267,16 +1312,15 @@ Ground responses with tools and keep them brief. Rules:
         const line = p.trim();
         if (!line.startsWith('data:')) continue;
         const dataStr = line.slice(5).trim();
-        if (dataStr === '[DONE]') { buffer = ''; break; }
+        if (dataStr === '[DONE]') break readLoop;
         try {
           const obj = JSON.parse(dataStr);
           const raw = obj?.choices?.[0]?.delta?.content || '';
           if (raw) {
             // Sanitize: remove disallowed URLs and instructive lines
             let sanitized = raw.replace(/https?:\/\/\S+/g, (u) => allowedUrls.has(u) ? u : '');
-            const instructive = /(\brefer to|\bsee|\bcheck|\bconsult|\bvisit|\bread)\b[^\n]{0,160}\b(manual|guide|documentation|docs|website|page|link|bulletin|datasheet|procedure)\b/i;
             const chunks = sanitized.split('\n');
-            const filtered = chunks.filter((ln) => !instructive.test(ln));
+            const filtered = chunks.filter((ln) => !INSTRUCTIVE_LINE_PATTERN.test(ln));
             sanitized = filtered.join('\n');
             if (sanitized) {
               finalBody += sanitized;
@@ -1291,14 +1335,8 @@ Ground responses with tools and keep them brief. Rules:
     let sourcesText = '';
     let structuredSources = { manuals: [], knowledge: [] };
     try {
-      const manuals = preToolResults
-        .filter((t) => t.name === 'search_manuals')
-        .flatMap((t) => { try { return (JSON.parse(t.content || '{}')?.items) || []; } catch { return []; } })
-        .slice(0, 1);
-      const knowledge = preToolResults
-        .filter((t) => t.name === 'get_verified_knowledge')
-        .flatMap((t) => { try { return (JSON.parse(t.content || '{}')?.items) || []; } catch { return []; } })
-        .slice(0, 1);
+      const manuals = preToolItems('search_manuals').slice(0, 1);
+      const knowledge = preToolItems('get_verified_knowledge').slice(0, 1);
       if (manuals.length > 0 || knowledge.length > 0) {
         sourcesText += '\n\nSources:';
         manuals.forEach((m) => {
@@ -1325,20 +1363,7 @@ Ground responses with tools and keep them brief. Rules:
     // Build structured
     let structured = null;
     try {
-      const displayMap = {
-        'worcester': 'Worcester Bosch',
-        'glow-worm': 'Glow-worm',
-        'viessmann': 'Viessmann',
-        'vaillant': 'Vaillant',
-        'ideal': 'Ideal',
-        'baxi': 'Baxi',
-        'potterton': 'Potterton',
-        'ariston': 'Ariston',
-        'ferroli': 'Ferroli',
-        'alpha': 'Alpha',
-        'ravenheat': 'Ravenheat',
-        'intergas': 'Intergas'
-      };
+      const displayMap = MANUFACTURER_DISPLAY_NAMES;
       const make = extracted?.manufacturer ? (displayMap[String(extracted.manufacturer).toLowerCase()] || extracted.manufacturer) : null;
       const model = extracted?.model || null;
       const system = extracted?.systemType ? (String(extracted.systemType).charAt(0).toUpperCase() + String(extracted.systemType).slice(1)) : null;
@@ -1351,8 +1376,7 @@ Ground responses with tools and keep them brief. Rules:
       const cautions = bodyLines.filter((l) => /(safety|caution|warning|danger)/i.test(l));
       const parts = (() => {
         const out = new Set();
-        const partWords = ['electrode','spark generator','ignition module','gas valve','fan','pump','diverter valve','pcb','pressure sensor','flame sensor','thermostat'];
-        bodyLines.forEach((l) => partWords.forEach((p) => { if (new RegExp(`\\b${p.replace(/\s+/g,'\\s+')}\\b`, 'i').test(l)) out.add(p); }));
+        bodyLines.forEach((l) => PART_PATTERNS.forEach(([p, re]) => { if (re.test(l)) out.add(p); }));
         return Array.from(out);
       })();
       const measurements = bodyLines.filter((l) => /(\b\d+(\.\d+)?\s*(bar|mbar|kpa|pa|v|vac|vdc|ohm|Ω|ma|a|hz|kw|°c|c)\b)/i.test(l));
@@ -1363,7 +1387,7 @@ Ground responses with tools and keep them brief. Rules:
     try {
       if (sessionId) {
         const historyNow = Array.isArray(chatHistory) ? [...chatHistory, { sender: 'assistant', text: finalBody, timestamp: new Date().toISOString() }] : [];
-        await SessionManager.updateSession(sessionId, historyNow);
+        await SessionManager.appendTurns(sessionId, historyNow.slice(persistedLength));
       }
     } catch {}
 
@@ -1375,55 +1399,9 @@ Ground responses with tools and keep them brief. Rules:
   }
 });
 
-app.post('/api/agent/chat', chatLimiter, validateChatMessage, async (req, res) => {
-  try {
-    const { message, sessionId, history, detail } = req.body;
-    const rid = randomUUID();
-    logger.info(`[Agent][${rid}] POST /api/agent/chat msgLen=${(message||'').length} sessionId=${sessionId||'-'}`);
-    if (!message) return res.status(400).json({ error: 'Missing message' });
-
-    let session = await SessionManager.getSession(sessionId);
-    let chatHistory = [];
-    if (session) {
-      chatHistory = session.history || [];
-    } else if (Array.isArray(history)) {
-      chatHistory = history;
-      if (sessionId) await SessionManager.createSession(sessionId, null, chatHistory);
-    } else if (sessionId) {
-      await SessionManager.createSession(sessionId, null, []);
-    }
-
-    chatHistory.push({ sender: 'user', text: message, timestamp: new Date().toISOString() });
-    
-    // Check if we have required boiler information FIRST
-    const conversationText = chatHistory.map(m => m.text || '').join(' ').toLowerCase();
-    const hasManufacturer = /\b(worcester|vaillant|baxi|ideal|glow ?worm|potterton|viessmann|ariston|navien|bosch|bosh)\b/i.test(conversationText);
-    const hasSystemType = /\b(combi|combination|system|regular|conventional|standard|heat only|back boiler)\b/i.test(conversationText);
-    
-    // If missing required info, ask for it BEFORE proceeding
-    if (!hasManufacturer || !hasSystemType) {
-      let reply = "Right, to help you out I need a bit more info. What boiler are you working on? I need the manufacturer (like Worcester, Vaillant, Ideal), the model if you know it, and the system type (combi, system, or regular).";
-      
-      if (hasManufacturer && !hasSystemType) {
-        reply = "Right, got the manufacturer. What type of system is it? Combi, system, or regular boiler?";
-      } else if (hasSystemType && !hasManufacturer) {
-        reply = "OK, got the system type. What make is it? Worcester, Vaillant, Baxi, Ideal, or another manufacturer?";
-      }
-      
-      chatHistory.push({ sender: 'assistant', text: reply, timestamp: new Date().toISOString() });
-      if (sessionId) await SessionManager.updateSession(sessionId, chatHistory);
-      return res.json({ reply });
-    }
-
-    const detailKeywords = /(diagnos|procedure|step|walkthrough|how to|detailed|full)/i;
-    const detailedMode = (detail === true) || detailKeywords.test(String(message || ''));
-    
-    // Adaptive temperature for agent endpoint - higher for more natural conversation
-    const hasFaultCodeAgent = /\b([fela]\.?\d{1,3}|EA)\b/i.test(conversationText);
-    const isSafetyCriticalAgent = /gas smell|leak|co alarm|carbon monoxide/i.test(conversationText);
-    let agentTemp = isSafetyCriticalAgent ? 0.3 : hasFaultCodeAgent ? 0.5 : detailedMode ? 0.4 : 0.6;
-
-    let system = `You are James, a Master Gas Safe engineer with 25+ years hands-on experience. You're the guy other engineers call when they're stuck.
+// Static agent prompt and tool schemas, built once at startup so every request
+// sends a byte-identical prefix (tools + system) that OpenAI prompt caching can reuse
+const AGENT_SYSTEM_PROMPT = `You are James, a Master Gas Safe engineer with 25+ years hands-on experience. You're the guy other engineers call when they're stuck.
 
 CRITICAL: You're talking to a FELLOW GAS SAFE REGISTERED ENGINEER on-site right now. They have all the skills and tools. NEVER suggest calling support or getting help. Guide them through the fix like you're on the phone with them.
 
@@ -1480,15 +1458,146 @@ CRITICAL: Only reference information the user ACTUALLY provided. If they haven't
 
 ALWAYS end with a specific question about what they're seeing.
 
-Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling support.`;
+Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling support.` + (
+  String(process.env.DB_ONLY_MODE || 'false').toLowerCase() === 'true'
+    ? `\n\nDB-ONLY: Use ONLY tool results. If insufficient, ask ONE clarifying question. No invented data.`
+    : ''
+);
+
+const AGENT_TOOL_GET_FAULT_INFO = {
+  type: 'function',
+  function: {
+    name: 'get_fault_info',
+    description: 'Get authoritative fault info from manufacturer database',
+    parameters: {
+      type: 'object',
+      properties: {
+        manufacturer: { type: 'string' },
+        fault_code: { type: 'string' },
+        user_text: { type: 'string' }
+      }
+    }
+  }
+};
+
+const AGENT_TOOL_SEARCH_MANUALS = {
+  type: 'function',
+  function: {
+    name: 'search_manuals',
+    description: 'Find manuals for a manufacturer and optional model',
+    parameters: {
+      type: 'object',
+      properties: {
+        manufacturer: { type: 'string' },
+        model: { type: 'string' },
+        limit: { type: 'number' }
+      },
+      required: ['manufacturer']
+    }
+  }
+};
+
+const AGENT_TOOL_GET_VERIFIED_KNOWLEDGE = {
+  type: 'function',
+  function: {
+    name: 'get_verified_knowledge',
+    description: 'Get verified knowledge items for a fault code and optional manufacturer',
+    parameters: {
+      type: 'object',
+      properties: {
+        fault_code: { type: 'string' },
+        manufacturer: { type: 'string' },
+        limit: { type: 'number' }
+      },
+      required: ['fault_code']
+    }
+  }
+};
+
+const AGENT_TOOL_UPDATE_SESSION = {
+  type: 'function',
+  function: {
+    name: 'update_session',
+    description: 'Persist a message in the chat session history',
+    parameters: {
+      type: 'object',
+      properties: {
+        session_id: { type: 'string' },
+        role: { type: 'string', enum: ['user', 'assistant'] },
+        message_text: { type: 'string' }
+      },
+      required: ['session_id', 'message_text']
+    }
+  }
+};
+
+const AGENT_TOOLS_WITH_FAULT = [AGENT_TOOL_GET_FAULT_INFO, AGENT_TOOL_SEARCH_MANUALS, AGENT_TOOL_GET_VERIFIED_KNOWLEDGE, AGENT_TOOL_UPDATE_SESSION];
+const AGENT_TOOLS_BASE = [AGENT_TOOL_SEARCH_MANUALS, AGENT_TOOL_UPDATE_SESSION];
+
+app.post('/api/agent/chat', chatLimiter, validateChatMessage, async (req, res) => {
+  try {
+    const { message, sessionId, history, detail } = req.body;
+    const rid = randomUUID();
+    logger.info(`[Agent][${rid}] POST /api/agent/chat msgLen=${(message||'').length} sessionId=${sessionId||'-'}`);
+    if (!message) return res.status(400).json({ error: 'Missing message' });
+
+    // Only the recent window is loaded; new turns are appended server-side on save
+    let session = await SessionManager.getRecentSession(sessionId);
+    let chatHistory = [];
+    if (session) {
+      chatHistory = session.history || [];
+    } else if (Array.isArray(history)) {
+      // New session: the row is created by the single upsert that saves this turn
+      chatHistory = history;
+    }
+    // Messages already stored; only the ones after this index are appended when the turn is saved
+    const persistedLength = session ? chatHistory.length : 0;
+    const historyContext = HistorySummarizer.contextFor(session, persistedLength);
+
+    chatHistory.push({ sender: 'user', text: message, timestamp: new Date().toISOString() });
+    
+    // Check if we have required boiler information FIRST
+    // Only recent turns are loaded, so flags seen earlier in the conversation come
+    // from the session row and are saved back with every turn
+    const storedContext = session?.context || {};
+    const conversationText = chatHistory.map(m => m.text || '').join(' ').toLowerCase();
+    const hasManufacturer = !!storedContext.hasManufacturer || /\b(worcester|vaillant|baxi|ideal|glow ?worm|potterton|viessmann|ariston|navien|bosch|bosh)\b/i.test(conversationText);
+    const hasSystemType = !!storedContext.hasSystemType || /\b(combi|combination|system|regular|conventional|standard|heat only|back boiler)\b/i.test(conversationText);
+    const hasFaultCodeAgent = !!storedContext.hasFaultCode || /\b([fela]\.?\d{1,3}|EA)\b/i.test(conversationText);
+    const isSafetyCriticalAgent = !!storedContext.safetyCritical || /gas smell|leak|co alarm|carbon monoxide/i.test(conversationText);
+    const sessionContext = { hasManufacturer, hasSystemType, hasFaultCode: hasFaultCodeAgent, safetyCritical: isSafetyCriticalAgent };
+    const saveTurns = (turns) => SessionManager.appendTurns(sessionId, turns, { context: sessionContext });
     
-    if (String(process.env.DB_ONLY_MODE || 'false').toLowerCase() === 'true') {
-      system += `\n\nDB-ONLY: Use ONLY tool results. If insufficient, ask ONE clarifying question. No invented data.`;
+    // If missing required info, ask for it BEFORE proceeding
+    if (!hasManufacturer || !hasSystemType) {
+      let reply = "Right, to help you out I need a bit more info. What boiler are you working on? I need the manufacturer (like Worcester, Vaillant, Ideal), the model if you know it, and the system type (combi, system, or regular).";
+      
+      if (hasManufacturer && !hasSystemType) {
+        reply = "Right, got the manufacturer. What type of system is it? Combi, system, or regular boiler?";
+      } else if (hasSystemType && !hasManufacturer) {
+        reply = "OK, got the system type. What make is it? Worcester, Vaillant, Baxi, Ideal, or another manufacturer?";
+      }
+      
+      chatHistory.push({ sender: 'assistant', text: reply, timestamp: new Date().toISOString() });
+      if (sessionId) await saveTurns(chatHistory.slice(persistedLength));
+      return res.json({ reply });
     }
 
+    const detailKeywords = /(diagnos|procedure|step|walkthrough|how to|detailed|full)/i;
+    const detailedMode = (detail === true) || detailKeywords.test(String(message || ''));
+    
+    // Adaptive temperature for agent endpoint - higher for more natural conversation
+    let agentTemp = isSafetyCriticalAgent ? 0.3 : hasFaultCodeAgent ? 0.5 : detailedMode ? 0.4 : 0.6;
+
+    const system = AGENT_SYSTEM_PROMPT;
+
     const toOpenAIMessages = [];
     toOpenAIMessages.push({ role: 'system', content: system });
-    chatHistory.forEach((m) => {
+    // Recent messages verbatim; older ones are carried by the rolling summary (refreshed in the background)
+    const { summary: historySummary, recent: recentHistory } = HistorySummarizer.condense(chatHistory, historyContext);
+    if (historySummary) toOpenAIMessages.push({ role: 'system', content: `Earlier in this conversation: ${historySummary}` });
+    HistorySummarizer.refresh(sessionId, chatHistory, historyContext);
+    recentHistory.forEach((m) => {
       const t = m?.text;
       const s = typeof t === 'string' ? t : (t && typeof t === 'object' && typeof t.text === 'string' ? t.text : '');
       toOpenAIMessages.push({ role: m.sender === 'user' ? 'user' : 'assistant', content: s });
@@ -1506,7 +1615,7 @@ Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling s
         })
         .join('\n');
       const faultRegex = /\b(?:[FfEeLlAa]\.?\d{1,3}|EA)\b/;
-      hasPriorFaultMention = faultRegex.test(historyText);
+      hasPriorFaultMention = !!storedContext.hasFaultCode || faultRegex.test(historyText);
     } catch {}
     const preToolCalls = [];
     const preToolResults = [];
@@ -1520,47 +1629,41 @@ Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling s
         toOpenAIMessages.push({ role: 'system', content: `Context: ${ctxParts.join(' | ')}` });
       }
     }
+    const preTools = [];
     // Pre-seed manuals if we know manufacturer/model (model-only flow)
     if (extracted?.manufacturer) {
-      const tc2 = { id: 'pre_2', type: 'function', function: { name: 'search_manuals', arguments: JSON.stringify({ manufacturer: extracted.manufacturer, model: extracted?.model || null, limit: 1 }) } };
-      preToolCalls.push(tc2);
-      try {
-        const t0 = Date.now();
-        const r2 = await AgentTools.search_manuals({ manufacturer: extracted.manufacturer, model: extracted?.model || null, limit: 1 });
-        logger.info(`[Agent][${rid}] tool search_manuals dt=${Date.now()-t0}ms items=${(r2?.items||[]).length}`);
-        preToolResults.push({ role: 'tool', tool_call_id: tc2.id, name: 'search_manuals', content: JSON.stringify(r2) });
-      } catch {}
+      preTools.push({ id: 'pre_2', name: 'search_manuals', args: { manufacturer: extracted.manufacturer, model: extracted?.model || null, limit: 1 }, summary: (r) => `items=${(r?.items||[]).length}` });
     }
     // Pre-seed symptom guidance for model-only or symptom-only queries
     if ((extracted?.manufacturer || extracted?.model) && !extracted?.faultCode) {
-      const tc4 = { id: 'pre_4', type: 'function', function: { name: 'get_symptom_guidance', arguments: JSON.stringify({ manufacturer: extracted?.manufacturer || null, model: extracted?.model || null, symptoms: String(message || ''), limit: 5 }) } };
-      preToolCalls.push(tc4);
-      try {
-        const t0 = Date.now();
-        const r4 = await AgentTools.get_symptom_guidance({ manufacturer: extracted?.manufacturer || null, model: extracted?.model || null, symptoms: String(message || ''), limit: 5 });
-        logger.info(`[Agent][${rid}] tool get_symptom_guidance dt=${Date.now()-t0}ms items=${(r4?.items||[]).length}`);
-        preToolResults.push({ role: 'tool', tool_call_id: tc4.id, name: 'get_symptom_guidance', content: JSON.stringify(r4) });
-      } catch {}
+      preTools.push({ id: 'pre_4', name: 'get_symptom_guidance', args: { manufacturer: extracted?.manufacturer || null, model: extracted?.model || null, symptoms: String(message || ''), limit: 5 }, summary: (r) => `items=${(r?.items||[]).length}` });
     }
     // Only pre-seed fault info and knowledge when we have a real fault code
     if (extracted?.faultCode) {
-      const tc1 = { id: 'pre_1', type: 'function', function: { name: 'get_fault_info', arguments: JSON.stringify({ manufacturer: extracted?.manufacturer || null, fault_code: extracted?.faultCode || null, user_text: String(message || '') }) } };
-      preToolCalls.push(tc1);
-      try {
-        const t0 = Date.now();
-        const r1 = await AgentTools.get_fault_info({ manufacturer: extracted?.manufacturer || null, fault_code: extracted?.faultCode || null, user_text: String(message || '') });
-        logger.info(`[Agent][${rid}] tool get_fault_info dt=${Date.now()-t0}ms found=${!!r1?.found}`);
-        preToolResults.push({ role: 'tool', tool_call_id: tc1.id, name: 'get_fault_info', content: JSON.stringify(r1) });
-      } catch {}
-      const tc3 = { id: 'pre_3', type: 'function', function: { name: 'get_verified_knowledge', arguments: JSON.stringify({ fault_code: extracted.faultCode, manufacturer: extracted?.manufacturer || null, limit: 1 }) } };
-      preToolCalls.push(tc3);
+      preTools.push({ id: 'pre_1', name: 'get_fault_info', args: { manufacturer: extracted?.manufacturer || null, fault_code: extracted?.faultCode || null, user_text: String(message || '') }, summary: (r) => `found=${!!r?.found}` });
+      preTools.push({ id: 'pre_3', name: 'get_verified_knowledge', args: { fault_code: extracted.faultCode, manufacturer: extracted?.manufacturer || null, limit: 1 }, summary: (r) => `items=${(r?.items||[]).length}` });
+    }
+    // Lookups are independent: run them concurrently, then append results in a fixed order
+    const preToolOutcomes = await Promise.all(preTools.map(async (t) => {
       try {
         const t0 = Date.now();
-        const r3 = await AgentTools.get_verified_knowledge({ fault_code: extracted.faultCode, manufacturer: extracted?.manufacturer || null, limit: 1 });
-        logger.info(`[Agent][${rid}] tool get_verified_knowledge dt=${Date.now()-t0}ms items=${(r3?.items||[]).length}`);
-        preToolResults.push({ role: 'tool', tool_call_id: tc3.id, name: 'get_verified_knowledge', content: JSON.stringify(r3) });
-      } catch {}
-    }
+        const result = await AgentTools[t.name](t.args);
+        logger.info(`[Agent][${rid}] tool ${t.name} dt=${Date.now()-t0}ms ${t.summary(result)}`);
+        return { ok: true, result };
+      } catch {
+        return { ok: false };
+      }
+    }));
+    // Keep the decoded results; tool messages carry the JSON only for the model
+    const preToolData = {};
+    preTools.forEach((t, i) => {
+      preToolCalls.push({ id: t.id, type: 'function', function: { name: t.name, arguments: JSON.stringify(t.args) } });
+      if (preToolOutcomes[i].ok) {
+        preToolData[t.name] = preToolOutcomes[i].result;
+        preToolResults.push({ role: 'tool', tool_call_id: t.id, name: t.name, content: JSON.stringify(preToolOutcomes[i].result) });
+      }
+    });
+    const preToolItems = (name) => preToolData[name]?.items || [];
     if (preToolCalls.length > 0) {
       toOpenAIMessages.push({ role: 'assistant', content: '', tool_calls: preToolCalls });
       preToolResults.forEach((t) => toOpenAIMessages.push(t));
@@ -1572,38 +1675,19 @@ Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling s
       const askMake = /(what\s+(boiler\s+)?(make|brand|manufacturer)|which\s+brand)/i.test(lowerMsg);
       const askModel = /(what\s+(boiler\s+)?model|which\s+model)/i.test(lowerMsg);
       if ((askMake || askModel)) {
-        const displayMap = {
-          'worcester': 'Worcester Bosch',
-          'glow-worm': 'Glow-worm',
-          'viessmann': 'Viessmann',
-          'vaillant': 'Vaillant',
-          'ideal': 'Ideal',
-          'baxi': 'Baxi',
-          'potterton': 'Potterton',
-          'ariston': 'Ariston',
-          'ferroli': 'Ferroli',
-          'alpha': 'Alpha',
-          'ravenheat': 'Ravenheat',
-          'intergas': 'Intergas'
-        };
+        const displayMap = MANUFACTURER_DISPLAY_NAMES;
         let make = extracted?.manufacturer || null;
         let model = extracted?.model || null;
         let systemType = extracted?.systemType || null;
         // Try to infer from tool results
         try {
           if (!make) {
-            const mItem = preToolResults
-              .filter((t) => t.name === 'search_manuals')
-              .map((t) => { try { return (JSON.parse(t.content || '{}')?.items)||[]; } catch { return []; } })
-              .flat()[0];
+            const mItem = preToolItems('search_manuals')[0];
             if (mItem?.manufacturer) make = mItem.manufacturer;
             if (!model && mItem?.name) model = mItem.name;
           }
           if (!make) {
-            const kItem = preToolResults
-              .filter((t) => t.name === 'get_verified_knowledge')
-              .map((t) => { try { return (JSON.parse(t.content || '{}')?.items)||[]; } catch { return []; } })
-              .flat()[0];
+            const kItem = preToolItems('get_verified_knowledge')[0];
             if (kItem?.manufacturer) make = kItem.manufacturer;
           }
         } catch {}
@@ -1667,7 +1751,7 @@ Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling s
         if (sessionId) {
           try {
             const historyNow = Array.isArray(chatHistory) ? [...chatHistory, { sender: 'assistant', text: finalText, timestamp: new Date().toISOString() }] : [];
-            await SessionManager.updateSession(sessionId, historyNow);
+            await saveTurns(historyNow.slice(persistedLength));
           } catch {}
         }
         const structured = {
@@ -1679,74 +1763,55 @@ Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling s
       }
     } catch {}
 
-    const tools = [];
-    if (extracted?.faultCode) {
-      tools.push({
-        type: 'function',
-        function: {
-          name: 'get_fault_info',
-          description: 'Get authoritative fault info from manufacturer database',
-          parameters: {
-            type: 'object',
-            properties: {
-              manufacturer: { type: 'string' },
-              fault_code: { type: 'string' },
-              user_text: { type: 'string' }
-            }
-          }
-        }
-      });
-    }
-    tools.push({
-      type: 'function',
-      function: {
-        name: 'search_manuals',
-        description: 'Find manuals for a manufacturer and optional model',
-        parameters: {
-          type: 'object',
-          properties: {
-            manufacturer: { type: 'string' },
-            model: { type: 'string' },
-            limit: { type: 'number' }
-          },
-          required: ['manufacturer']
+    // Full-text prefilter: an opening question about a known fault code with a strong
+    // database match is answered straight from boiler_fault_codes (no LLM call)
+    const useFtsPrefilter = String(process.env.USE_FTS_PREFILTER || 'false').toLowerCase() === 'true';
+    if (useFtsPrefilter && extracted?.faultCode && extracted?.manufacturer && chatHistory.length === 1 && !isSafetyCriticalAgent) {
+      const t0 = Date.now();
+      const row = await EnhancedFaultCodeService.searchFaultCodeFullText(String(message), { manufacturer: extracted.manufacturer, faultCode: extracted.faultCode, model: extracted.model, systemType: extracted.systemType });
+      const minRank = Number(process.env.FTS_PREFILTER_MIN_RANK || CONSTANTS.FTS_PREFILTER_MIN_RANK);
+      if (row?.description && Number(row.rank) >= minRank) {
+        logger.info(`[Agent][${rid}] fts prefilter hit rank=${Number(row.rank).toFixed(3)} dt=${Date.now()-t0}ms`);
+        const code = String(row.fault_code || extracted.faultCode).toUpperCase();
+        const make = row.manufacturer || extracted.manufacturer;
+        const steps = String(row.solutions || '').split('\n').map((l) => l.replace(/^\s*(?:[-•—]|\d+[\.)])\s*/, '').trim()).filter(Boolean);
+        let reply = `${make} ${code}: ${String(row.description).trim()}`;
+        if (steps.length > 0) reply += `\n\n${steps.map((st, i) => `${i + 1}. ${st}`).join('\n')}`;
+        if (sessionId) {
+          try {
+            const historyNow = [...chatHistory, { sender: 'assistant', text: reply, timestamp: new Date().toISOString() }];
+            await saveTurns(historyNow.slice(persistedLength));
+          } catch {}
         }
+        const structured = {
+          header: { make, model: extracted?.model || null, system: extracted?.systemType ? (String(extracted.systemType).charAt(0).toUpperCase() + String(extracted.systemType).slice(1)) : null, faultCode: code },
+          bullets: [], steps, cautions: [], parts: [], measurements: [], sources: { manuals: [], knowledge: [] }
+        };
+        return res.json({ reply, sessionId: sessionId || null, structured });
       }
-    });
-    if (extracted?.faultCode) {
-      tools.push({
-        type: 'function',
-        function: {
-          name: 'get_verified_knowledge',
-          description: 'Get verified knowledge items for a fault code and optional manufacturer',
-          parameters: {
-            type: 'object',
-            properties: {
-              fault_code: { type: 'string' },
-              manufacturer: { type: 'string' },
-              limit: { type: 'number' }
-            },
-            required: ['fault_code']
-          }
-        }
-      });
     }
-    tools.push({
-      type: 'function',
-      function: {
-        name: 'update_session',
-        description: 'Persist a message in the chat session history',
-        parameters: {
-          type: 'object',
-          properties: {
-            session_id: { type: 'string' },
-            role: { type: 'string', enum: ['user', 'assistant'] },
-            message_text: { type: 'string' }
-          },
-          required: ['session_id', 'message_text']
+
+    // Semantic cache: reuse a prior reply for a near-duplicate opening fault question
+    // Scoped by make/model/code and reply depth; safety-critical questions always go to the model
+    const semanticScope = { manufacturer: extracted?.manufacturer || null, model: extracted?.model || null, faultCode: extracted?.faultCode || null, detailed: !!detailedMode };
+    let semanticEmbedding = null;
+    if (SemanticCache.isEnabled() && extracted?.faultCode && chatHistory.length === 1 && !isSafetyCriticalAgent) {
+      const t0 = Date.now();
+      const hit = await SemanticCache.lookup(String(message), semanticScope);
+      semanticEmbedding = hit.embedding;
+      if (hit.response?.reply) {
+        logger.info(`[Agent][${rid}] semantic cache hit sim=${hit.similarity.toFixed(3)} dt=${Date.now()-t0}ms`);
+        if (sessionId) {
+          try {
+            const historyNow = [...chatHistory, { sender: 'assistant', text: hit.response.reply, timestamp: new Date().toISOString() }];
+            await saveTurns(historyNow.slice(persistedLength));
+          } catch {}
         }
+        return res.json({ reply: hit.response.reply, sessionId: sessionId || null, structured: hit.response.structured || null });
       }
-    });
+    }
+
+    const tools = extracted?.faultCode ? AGENT_TOOLS_WITH_FAULT : AGENT_TOOLS_BASE;
 
     const openaiKeys = [
       process.env.OPENAI_API_KEY,
@@ -1755,24 +1820,41 @@ Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling s
     ].filter(Boolean);
 
     async function runOnce(messages) {
-      for (let i = 0; i < openaiKeys.length; i++) {
-        const key = openaiKeys[i];
-        try {
-          const t0 = Date.now();
-          logger.info(`[Agent][${rid}] openai call start key#${i} msgs=${messages.length}`);
-          const response = await fetch('https://api.openai.com/v1/chat/completions', {
-            method: 'POST',
-            headers: { 'Authorization': `Bearer ${key}`, 'Content-Type': 'application/json' },
-            body: JSON.stringify({ model: hasFaultCodeAgent ? 'gpt-4o' : 'gpt-4o-mini', messages, tools, tool_choice: 'auto', temperature: agentTemp, max_tokens: detailedMode ? 1500 : 800, frequency_penalty: 0.2, presence_penalty: 0.1 })
-          });
-          if (!response.ok) continue;
-          const data = await response.json();
-          const usage = data?.usage || {};
-          logger.info(`[Agent][${rid}] openai call done dt=${Date.now()-t0}ms tokens=${usage.total_tokens||'-'}`);
-          return data;
-        } catch (e) { continue; }
+      const requestBody = { model: hasFaultCodeAgent ? 'gpt-4o' : 'gpt-4o-mini', messages, tools, tool_choice: 'auto', temperature: agentTemp, max_tokens: detailedMode ? 1500 : 800, frequency_penalty: 0.2, presence_penalty: 0.1 };
+      // Identical prompt + history at low temperature: replay the stored completion
+      // (never for safety-critical turns, which always go to the model)
+      const cacheKey = llmCache.isCacheable(agentTemp) && !isSafetyCriticalAgent ? llmCache.buildKey(requestBody) : null;
+      if (cacheKey) {
+        const cached = await llmCache.get(cacheKey);
+        if (cached) {
+          logger.info(`[Agent][${rid}] openai cache hit msgs=${messages.length}`);
+          return cached;
+        }
       }
-      return null;
+      const callOpenAI = async () => {
+        for (let i = 0; i < openaiKeys.length; i++) {
+          const key = openaiKeys[i];
+          try {
+            const t0 = Date.now();
+            logger.info(`[Agent][${rid}] openai call start key#${i} msgs=${messages.length}`);
+            const response = await fetch('https://api.openai.com/v1/chat/completions', {
+              method: 'POST',
+              agent: httpsAgent,
+              headers: { 'Authorization': `Bearer ${key}`, 'Content-Type': 'application/json' },
+              body: JSON.stringify(requestBody)
+            });
+            if (!response.ok) continue;
+            const data = await response.json();
+            const usage = data?.usage || {};
+            logger.info(`[Agent][${rid}] openai call done dt=${Date.now()-t0}ms tokens=${usage.total_tokens||'-'}`);
+            if (cacheKey) await llmCache.set(cacheKey, data);
+            return data;
+          } catch (e) { continue; }
+        }
+        return null;
+      };
+      // Identical requests already in flight share that call rather than starting another
+      return cacheKey ? llmCache.singleFlight(cacheKey, callOpenAI) : callOpenAI();
     }
 
     let messages = toOpenAIMessages.slice();
@@ -1814,16 +1896,11 @@ Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling s
       finalText = data?.choices?.[0]?.message?.content || '';
     }
 
+    const hasModelReply = !!finalText;
     if (!finalText) finalText = "I'm having trouble responding right now. Please try again shortly.";
 
     let modelTipText = '';
-    try {
-      const gf = preToolResults.find((t) => t.name === 'get_fault_info');
-      if (gf) {
-        const parsed = JSON.parse(gf.content || '{}');
-        if (parsed?.modelTips) modelTipText = String(parsed.modelTips);
-      }
-    } catch {}
+    if (preToolData.get_fault_info?.modelTips) modelTipText = String(preToolData.get_fault_info.modelTips);
     // Model tips are now integrated into the AI's natural response by the system prompt
     // No need to prepend them separately
 
@@ -1831,20 +1908,7 @@ Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling s
     try {
       if (!extracted?.faultCode && !hasPriorFaultMention) {
         const parts = [];
-        const displayMap = {
-          'worcester': 'Worcester Bosch',
-          'glow-worm': 'Glow-worm',
-          'viessmann': 'Viessmann',
-          'vaillant': 'Vaillant',
-          'ideal': 'Ideal',
-          'baxi': 'Baxi',
-          'potterton': 'Potterton',
-          'ariston': 'Ariston',
-          'ferroli': 'Ferroli',
-          'alpha': 'Alpha',
-          'ravenheat': 'Ravenheat',
-          'intergas': 'Intergas'
-        };
+        const displayMap = MANUFACTURER_DISPLAY_NAMES;
         if (extracted?.manufacturer) {
           const mfRaw = String(extracted.manufacturer).toLowerCase();
           const displayMf = displayMap[mfRaw] || (mfRaw.charAt(0).toUpperCase() + mfRaw.slice(1));
@@ -1863,18 +1927,8 @@ Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling s
 
     if (preToolResults.length > 0) {
       try {
-        const manuals = preToolResults
-          .filter((t) => t.name === 'search_manuals')
-          .flatMap((t) => {
-            try { return (JSON.parse(t.content || '{}')?.items) || []; } catch { return []; }
-          })
-          .slice(0, 1);
-        const knowledge = preToolResults
-          .filter((t) => t.name === 'get_verified_knowledge')
-          .flatMap((t) => {
-            try { return (JSON.parse(t.content || '{}')?.items) || []; } catch { return []; }
-          })
-          .slice(0, 1);
+        const manuals = preToolItems('search_manuals').slice(0, 1);
+        const knowledge = preToolItems('get_verified_knowledge').slice(0, 1);
         let referencesText = '';
         if (manuals.length > 0 || knowledge.length > 0) {
           referencesText += '\n\nSources:';
@@ -1902,43 +1956,22 @@ Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling s
 
     try {
       const allowedUrls = new Set();
-      preToolResults
-        .filter((t) => t.name === 'search_manuals')
-        .forEach((t) => {
-          try {
-            const items = (JSON.parse(t.content || '{}')?.items) || [];
-            items.forEach((m) => { if (m?.url) allowedUrls.add(String(m.url)); });
-          } catch {}
-        });
+      preToolItems('search_manuals').forEach((m) => { if (m?.url) allowedUrls.add(String(m.url)); });
       let bodyPart = finalText;
       let refsPart = '';
       const idx = finalText.indexOf('\n\nSources:');
       if (idx >= 0) { bodyPart = finalText.slice(0, idx); refsPart = finalText.slice(idx); }
       bodyPart = bodyPart.replace(/https?:\/\/\S+/g, (u) => allowedUrls.has(u) ? u : '');
-      const instructive = /(\brefer to|\bsee|\bcheck|\bconsult|\bvisit|\bread)\b[^\n]{0,160}\b(manual|guide|documentation|docs|website|page|link|bulletin|datasheet|procedure)\b/i;
       bodyPart = bodyPart
         .split('\n')
-        .filter((line) => !instructive.test(line))
+        .filter((line) => !INSTRUCTIVE_LINE_PATTERN.test(line))
         .join('\n');
       finalText = bodyPart + refsPart;
     } catch {}
 
     // Build structured JSON response
     try {
-      const displayMap = {
-        'worcester': 'Worcester Bosch',
-        'glow-worm': 'Glow-worm',
-        'viessmann': 'Viessmann',
-        'vaillant': 'Vaillant',
-        'ideal': 'Ideal',
-        'baxi': 'Baxi',
-        'potterton': 'Potterton',
-        'ariston': 'Ariston',
-        'ferroli': 'Ferroli',
-        'alpha': 'Alpha',
-        'ravenheat': 'Ravenheat',
-        'intergas': 'Intergas'
-      };
+      const displayMap = MANUFACTURER_DISPLAY_NAMES;
       const make = extracted?.manufacturer ? (displayMap[String(extracted.manufacturer).toLowerCase()] || extracted.manufacturer) : null;
       const model = extracted?.model || null;
       const system = extracted?.systemType ? (String(extracted.systemType).charAt(0).toUpperCase() + String(extracted.systemType).slice(1)) : null;
@@ -1952,8 +1985,7 @@ Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling s
       const cautions = bodyLines.filter((l) => /(safety|caution|warning|danger)/i.test(l));
       const parts = (() => {
         const out = new Set();
-        const partWords = ['electrode','spark generator','ignition module','gas valve','fan','pump','diverter valve','pcb','pressure sensor','flame sensor','thermostat'];
-        bodyLines.forEach((l) => partWords.forEach((p) => { if (new RegExp(`\\b${p.replace(/\s+/g,'\\s+')}\\b`, 'i').test(l)) out.add(p); }));
+        bodyLines.forEach((l) => PART_PATTERNS.forEach(([p, re]) => { if (re.test(l)) out.add(p); }));
         return Array.from(out);
       })();
       const measurements = bodyLines.filter((l) => /(\b\d+(\.\d+)?\s*(bar|mbar|kpa|pa|v|vac|vdc|ohm|Ω|ma|a|hz|kw|°c|c)\b)/i.test(l));
@@ -1972,12 +2004,17 @@ Model numbers (24/28/30) are kW ratings NOT fault codes. Never suggest calling s
     if (sessionId) {
       try {
         const historyNow = Array.isArray(chatHistory) ? [...chatHistory, { sender: 'assistant', text: finalText, timestamp: new Date().toISOString() }] : [];
-        await SessionManager.updateSession(sessionId, historyNow);
+        await saveTurns(historyNow.slice(persistedLength));
       } catch {}
     }
 
     logger.info(`[Agent][${rid}] respond len=${finalText.length} structured=${structured ? 'y' : 'n'}`);
     res.json({ reply: finalText, sessionId: sessionId || null, structured: typeof structured !== 'undefined' ? structured : null });
+
+    // Cache the reply after responding so a miss does not wait on the insert
+    if (semanticEmbedding && hasModelReply && !isSafetyCriticalAgent) {
+      SemanticCache.store(String(message), semanticScope, semanticEmbedding, { reply: finalText, structured: typeof structured !== 'undefined' ? structured : null }).catch(() => {});
+    }
   } catch (error) {
     logger.error('[Agent Chat] Endpoint error:', error);
     res.status(500).json({ error: 'Internal server error' });
@@ -2009,12 +2046,22 @@ app.post('/api/sessions/get', async (req, res) => {
   }
 });
 
+// Under cluster.js only one worker runs the shared database cleanup (sessions,
+// and the LLM cache when it is Supabase-backed); each worker still prunes its
+// own in-memory caches
+const runsSharedJobs = (process.env.CLUSTER_WORKER_ROLE || 'jobs') === 'jobs';
+
 // Session cleanup job - runs every hour
 setInterval(async () => {
   try {
-    const cleaned = await SessionManager.cleanupExpiredSessions();
-    if (cleaned > 0) {
-      console.log(`[Cleanup] Removed ${cleaned} expired sessions`);
+    if (runsSharedJobs) {
+      const cleaned = await SessionManager.cleanupExpiredSessions();
+      if (cleaned > 0) {
+        console.log(`[Cleanup] Removed ${cleaned} expired sessions`);
+      }
+    }
+    if (runsSharedJobs || !llmCache.isShared) {
+      await llmCache.clearExpired();
     }
   } catch (error) {
     console.error('[Cleanup] Session cleanup failed:', error);
@@ -2022,9 +2069,11 @@ setInterval(async () => {
 }, 60 * 60 * 1000); // Every 1 hour
 
 // Initial cleanup on startup
-SessionManager.cleanupExpiredSessions().catch(err => 
-console.error('[Cleanup] Initial cleanup failed:', err)
-);
+if (runsSharedJobs) {
+  SessionManager.cleanupExpiredSessions().catch(err => 
+  console.error('[Cleanup] Initial cleanup failed:', err)
+  );
+}
 
 // --- POST /api/feedback ---
 // Endpoint to receive user feedback on AI responses
@@ -2058,7 +2107,12 @@ try {
 
 // Start server
 app.listen(PORT, '0.0.0.0', () => {
-  console.log(`Boiler Brain server running on port ${PORT}`);
+  console.log(`Boiler Brain server running on port ${PORT} (pid ${process.pid})`);
   console.log(`Environment: ${process.env.NODE_ENV || 'development'}`);
   console.log(`CORS origins: ${process.env.ALLOWED_ORIGINS || '*'}`);
+
+  // Open pooled OpenAI connections so the first chat requests skip the TLS handshake
+  if (process.env.OPENAI_API_KEY) {
+    prewarmConnections('https://api.openai.com/v1/models').catch(() => {});
+  }
 });
@@ -0,0 +1,70 @@
+-- LLM Semantic Cache
+-- Stores agent replies keyed by question embedding so near-duplicate
+-- questions ("F1 on Ideal Logic" vs "Ideal Logic throwing F1") reuse a prior answer
+
+create extension if not exists vector;
+create extension if not exists pgcrypto;
+
+create table if not exists public.llm_semantic_cache (
+  id uuid primary key default gen_random_uuid(),
+  question text not null,
+  manufacturer text,
+  model text,
+  fault_code text,
+  detailed boolean not null default false,
+  embedding vector(1536) not null,
+  response jsonb not null,
+  created_at timestamptz default now()
+);
+
+-- Columns added after the first version of this table
+alter table public.llm_semantic_cache add column if not exists model text;
+alter table public.llm_semantic_cache add column if not exists detailed boolean not null default false;
+
+-- IVFFlat index for cosine ANN search
+create index if not exists llm_semantic_cache_embedding_ivfflat
+  on public.llm_semantic_cache using ivfflat (embedding vector_cosine_ops) with (lists = 100);
+create index if not exists idx_llm_semantic_cache_scope
+  on public.llm_semantic_cache (manufacturer, fault_code, model, detailed);
+create index if not exists idx_llm_semantic_cache_created_at
+  on public.llm_semantic_cache (created_at);
+
+-- Nearest cached reply within the same manufacturer / model / fault code / reply depth scope
+drop function if exists public.match_llm_semantic_cache(vector, text, text, int);
+create or replace function public.match_llm_semantic_cache(
+  query_embedding vector(1536),
+  p_manufacturer text default null,
+  p_model text default null,
+  p_fault_code text default null,
+  p_detailed boolean default false,
+  max_age_seconds int default 86400
+)
+returns table (
+  id uuid,
+  question text,
+  response jsonb,
+  similarity float
+)
+language plpgsql
+as $$
+begin
+  return query
+  select
+    c.id,
+    c.question,
+    c.response,
+    1 - (c.embedding <=> query_embedding) as similarity
+  from public.llm_semantic_cache c
+  where
+    c.manufacturer is not distinct from p_manufacturer and
+    c.model is not distinct from p_model and
+    c.fault_code is not distinct from p_fault_code and
+    c.detailed = p_detailed and
+    c.created_at > now() - make_interval(secs => max_age_seconds)
+  order by c.embedding <=> query_embedding
+  limit 1;
+end;
+$$;
+
+comment on table public.llm_semantic_cache is 'Agent replies cached by question embedding (semantic cache)';
+comment on column public.llm_semantic_cache.response is 'Cached reply payload: { reply, structured }';
@@ -0,0 +1,32 @@
+-- LLM Response Cache
+-- Exact-match OpenAI completion cache shared by all server instances
+-- (used when LLM_CACHE_BACKEND=supabase)
+
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+  cache_key TEXT PRIMARY KEY,
+  value JSONB NOT NULL,
+  expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Indexes for performance
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires_at ON llm_response_cache(expires_at);
+
+-- Cleanup of expired entries (the server also prunes hourly)
+CREATE OR REPLACE FUNCTION cleanup_expired_llm_response_cache()
+RETURNS INTEGER AS $$
+DECLARE
+  deleted_count INTEGER;
+BEGIN
+  DELETE FROM llm_response_cache
+  WHERE expires_at < NOW();
+
+  GET DIAGNOSTICS deleted_count = ROW_COUNT;
+  RETURN deleted_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Comments for documentation
+COMMENT ON TABLE llm_response_cache IS 'Exact-match cache of OpenAI chat completions';
+COMMENT ON COLUMN llm_response_cache.cache_key IS 'SHA-256 of the canonical request payload';
+COMMENT ON COLUMN llm_response_cache.value IS 'Raw chat completion response';
@@ -0,0 +1,71 @@
+-- Chat Session History Append
+-- Server-side JSONB append and tail reads so each turn only transfers the
+-- new messages instead of the whole conversation
+
+-- Append turns to a session (creating it if needed) in one statement.
+-- An expired row is restarted with just the new turns rather than appended to,
+-- so a reused session id never revives history that get_chat_session_recent hid
+CREATE OR REPLACE FUNCTION append_chat_session_turns(
+  p_session_id UUID,
+  p_turns JSONB,
+  p_expires_at TIMESTAMP WITH TIME ZONE
+)
+RETURNS TABLE (
+  session_id UUID,
+  history_length INTEGER,
+  updated_at TIMESTAMP WITH TIME ZONE
+) AS $$
+#variable_conflict use_column
+BEGIN
+  RETURN QUERY
+  INSERT INTO chat_sessions AS s (session_id, history, expires_at, last_active)
+  VALUES (p_session_id, COALESCE(p_turns, '[]'::jsonb), p_expires_at, NOW())
+  ON CONFLICT (session_id) DO UPDATE SET
+    history = CASE
+      WHEN s.expires_at <= NOW() THEN COALESCE(EXCLUDED.history, '[]'::jsonb)
+      ELSE COALESCE(s.history, '[]'::jsonb) || COALESCE(EXCLUDED.history, '[]'::jsonb)
+    END,
+    expires_at = EXCLUDED.expires_at,
+    last_active = NOW()
+  RETURNING s.session_id, jsonb_array_length(s.history), s.updated_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Fetch a live session with only its most recent turns
+CREATE OR REPLACE FUNCTION get_chat_session_recent(
+  p_session_id UUID,
+  p_limit INTEGER DEFAULT 40
+)
+RETURNS TABLE (
+  session_id UUID,
+  history JSONB,
+  history_length INTEGER,
+  updated_at TIMESTAMP WITH TIME ZONE,
+  expires_at TIMESTAMP WITH TIME ZONE
+) AS $$
+#variable_conflict use_column
+BEGIN
+  RETURN QUERY
+  SELECT
+    s.session_id,
+    COALESCE((
+      SELECT jsonb_agg(t.value ORDER BY t.ord)
+      FROM (
+        SELECT e.value, e.ord
+        FROM jsonb_array_elements(COALESCE(s.history, '[]'::jsonb)) WITH ORDINALITY AS e(value, ord)
+        ORDER BY e.ord DESC
+        LIMIT p_limit
+      ) t
+    ), '[]'::jsonb),
+    jsonb_array_length(COALESCE(s.history, '[]'::jsonb)),
+    s.updated_at,
+    s.expires_at
+  FROM chat_sessions s
+  WHERE s.session_id = p_session_id
+    AND s.expires_at > NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Comments for documentation
+COMMENT ON FUNCTION append_chat_session_turns IS 'Append messages to chat_sessions.history server-side (upserts the session, restarting expired ones)';
+COMMENT ON FUNCTION get_chat_session_recent IS 'Return a live session with only its last p_limit history entries';
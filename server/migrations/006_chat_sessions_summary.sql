@@ -0,0 +1,82 @@
+-- Chat Session Rolling Summary
+-- Older turns are condensed into a summary so prompts only carry the recent
+-- messages verbatim (see services/HistorySummarizer.js)
+
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary_through INTEGER DEFAULT 0;
+
+-- Return type changes, so the 005 function must be dropped first
+DROP FUNCTION IF EXISTS get_chat_session_recent(UUID, INTEGER);
+
+CREATE OR REPLACE FUNCTION get_chat_session_recent(
+  p_session_id UUID,
+  p_limit INTEGER DEFAULT 40
+)
+RETURNS TABLE (
+  session_id UUID,
+  history JSONB,
+  history_length INTEGER,
+  summary TEXT,
+  summary_through INTEGER,
+  updated_at TIMESTAMP WITH TIME ZONE,
+  expires_at TIMESTAMP WITH TIME ZONE
+) AS $$
+#variable_conflict use_column
+BEGIN
+  RETURN QUERY
+  SELECT
+    s.session_id,
+    COALESCE((
+      SELECT jsonb_agg(t.value ORDER BY t.ord)
+      FROM (
+        SELECT e.value, e.ord
+        FROM jsonb_array_elements(COALESCE(s.history, '[]'::jsonb)) WITH ORDINALITY AS e(value, ord)
+        ORDER BY e.ord DESC
+        LIMIT p_limit
+      ) t
+    ), '[]'::jsonb),
+    jsonb_array_length(COALESCE(s.history, '[]'::jsonb)),
+    s.summary,
+    COALESCE(s.summary_through, 0),
+    s.updated_at,
+    s.expires_at
+  FROM chat_sessions s
+  WHERE s.session_id = p_session_id
+    AND s.expires_at > NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Restarting an expired session must also drop its summary, otherwise the
+-- old conversation would leak back in through the summary of the new one
+CREATE OR REPLACE FUNCTION append_chat_session_turns(
+  p_session_id UUID,
+  p_turns JSONB,
+  p_expires_at TIMESTAMP WITH TIME ZONE
+)
+RETURNS TABLE (
+  session_id UUID,
+  history_length INTEGER,
+  updated_at TIMESTAMP WITH TIME ZONE
+) AS $$
+#variable_conflict use_column
+BEGIN
+  RETURN QUERY
+  INSERT INTO chat_sessions AS s (session_id, history, expires_at, last_active)
+  VALUES (p_session_id, COALESCE(p_turns, '[]'::jsonb), p_expires_at, NOW())
+  ON CONFLICT (session_id) DO UPDATE SET
+    history = CASE
+      WHEN s.expires_at <= NOW() THEN COALESCE(EXCLUDED.history, '[]'::jsonb)
+      ELSE COALESCE(s.history, '[]'::jsonb) || COALESCE(EXCLUDED.history, '[]'::jsonb)
+    END,
+    summary = CASE WHEN s.expires_at <= NOW() THEN NULL ELSE s.summary END,
+    summary_through = CASE WHEN s.expires_at <= NOW() THEN 0 ELSE s.summary_through END,
+    expires_at = EXCLUDED.expires_at,
+    last_active = NOW()
+  RETURNING s.session_id, jsonb_array_length(s.history), s.updated_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Comments for documentation
+COMMENT ON COLUMN chat_sessions.summary IS 'Rolling LLM summary of history entries before summary_through';
+COMMENT ON COLUMN chat_sessions.summary_through IS 'Number of leading history entries covered by summary';
+COMMENT ON FUNCTION get_chat_session_recent IS 'Return a live session with only its last p_limit history entries';
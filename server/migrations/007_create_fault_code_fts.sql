@@ -0,0 +1,99 @@
+-- Fault Code Full-Text Search
+-- GIN index and ranked lookup over boiler_fault_codes so known fault codes
+-- can be answered straight from the database without an LLM call
+
+CREATE INDEX IF NOT EXISTS idx_boiler_fault_codes_fts ON boiler_fault_codes USING GIN (
+  to_tsvector('english',
+    COALESCE(manufacturer, '') || ' ' || COALESCE(fault_code, '') || ' ' ||
+    COALESCE(description, '') || ' ' || COALESCE(solutions, ''))
+);
+
+-- Best-matching fault code rows for free text, optionally pinned to a manufacturer / code.
+-- Only the descriptive words of the question are scored: the manufacturer, model,
+-- system type and fault code (which identify the row rather than describe the
+-- problem), bare numbers such as kW ratings, and generic filler are removed first.
+-- rank is the fraction of those words found in the row's description / solutions
+-- (0..1); a question with no descriptive words ("Ideal Logic Combi F1") ranks 1.
+-- p_manufacturer is the plain name; it is matched as a case-insensitive substring.
+DROP FUNCTION IF EXISTS match_fault_code_fts(TEXT, TEXT, TEXT, INTEGER);
+DROP FUNCTION IF EXISTS match_fault_code_fts(TEXT, TEXT, TEXT, TEXT, TEXT, INTEGER);
+
+CREATE OR REPLACE FUNCTION match_fault_code_fts(
+  query_text TEXT,
+  p_manufacturer TEXT DEFAULT NULL,
+  p_fault_code TEXT DEFAULT NULL,
+  p_model TEXT DEFAULT NULL,
+  p_system_type TEXT DEFAULT NULL,
+  match_count INTEGER DEFAULT 1
+)
+RETURNS TABLE (
+  id TEXT,
+  manufacturer TEXT,
+  fault_code TEXT,
+  description TEXT,
+  solutions TEXT,
+  rank REAL
+) AS $$
+#variable_conflict use_column
+DECLARE
+  q_terms TEXT[];
+  q TSQUERY;
+  mfr_pattern TEXT;
+BEGIN
+  SELECT COALESCE(array_agg(DISTINCT t.lexeme), '{}') INTO q_terms
+  FROM unnest(to_tsvector('english', COALESCE(query_text, ''))) t
+  WHERE t.lexeme !~ '^[0-9]+$'
+    AND t.lexeme <> ALL (tsvector_to_array(to_tsvector('english',
+      COALESCE(p_manufacturer, '') || ' ' || COALESCE(p_fault_code, '') || ' ' ||
+      COALESCE(p_model, '') || ' ' || COALESCE(p_system_type, '') ||
+      ' combi combination system regular conventional standard' ||
+      ' boiler fault code error showing displaying flashing means')));
+
+  IF NULLIF(btrim(p_manufacturer), '') IS NOT NULL THEN
+    mfr_pattern := '%' || replace(replace(replace(btrim(p_manufacturer), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+  END IF;
+
+  IF cardinality(q_terms) = 0 AND p_fault_code IS NULL THEN
+    RETURN;
+  END IF;
+
+  IF cardinality(q_terms) > 0 THEN
+    q := (SELECT string_agg(quote_literal(x), ' | ') FROM unnest(q_terms) x)::TSQUERY;
+  END IF;
+
+  RETURN QUERY
+  SELECT
+    f.id::TEXT,
+    f.manufacturer,
+    f.fault_code,
+    f.description,
+    f.solutions,
+    (CASE
+      WHEN cardinality(c.row_terms) = 0 THEN 1.0
+      ELSE (
+        SELECT count(*) FROM unnest(c.row_terms) x
+        WHERE x = ANY (tsvector_to_array(to_tsvector('english',
+          COALESCE(f.description, '') || ' ' || COALESCE(f.solutions, ''))))
+      )::REAL / cardinality(c.row_terms)
+    END)::REAL AS rank
+  FROM boiler_fault_codes f
+  -- Also drop words of the row's own manufacturer / code ("bosch" in "Worcester Bosch")
+  CROSS JOIN LATERAL (
+    SELECT COALESCE(array_agg(x), '{}') AS row_terms
+    FROM unnest(q_terms) x
+    WHERE x <> ALL (tsvector_to_array(to_tsvector('english',
+      COALESCE(f.manufacturer, '') || ' ' || COALESCE(f.fault_code, ''))))
+  ) c
+  WHERE
+    (q IS NULL OR to_tsvector('english',
+      COALESCE(f.manufacturer, '') || ' ' || COALESCE(f.fault_code, '') || ' ' ||
+      COALESCE(f.description, '') || ' ' || COALESCE(f.solutions, '')) @@ q)
+    AND (mfr_pattern IS NULL OR f.manufacturer ILIKE mfr_pattern)
+    AND (p_fault_code IS NULL OR upper(f.fault_code) = upper(p_fault_code))
+  ORDER BY rank DESC
+  LIMIT match_count;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Comments for documentation
+COMMENT ON FUNCTION match_fault_code_fts IS 'Full-text match over boiler_fault_codes; rank is the share of descriptive query terms found (0..1)';
@@ -0,0 +1,90 @@
+-- Chat Session Conversation Context
+-- Flags derived from the whole conversation (boiler make / system type stated,
+-- fault code mentioned, safety-critical mention) are stored on the row, because
+-- only the most recent turns are loaded per request
+
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS context JSONB DEFAULT '{}'::jsonb;
+
+-- Signature changes (p_context), so the 005/006 function must be dropped first
+DROP FUNCTION IF EXISTS append_chat_session_turns(UUID, JSONB, TIMESTAMP WITH TIME ZONE);
+
+CREATE OR REPLACE FUNCTION append_chat_session_turns(
+  p_session_id UUID,
+  p_turns JSONB,
+  p_expires_at TIMESTAMP WITH TIME ZONE,
+  p_context JSONB DEFAULT NULL
+)
+RETURNS TABLE (
+  session_id UUID,
+  history_length INTEGER,
+  updated_at TIMESTAMP WITH TIME ZONE
+) AS $$
+#variable_conflict use_column
+BEGIN
+  RETURN QUERY
+  INSERT INTO chat_sessions AS s (session_id, history, context, expires_at, last_active)
+  VALUES (p_session_id, COALESCE(p_turns, '[]'::jsonb), COALESCE(p_context, '{}'::jsonb), p_expires_at, NOW())
+  ON CONFLICT (session_id) DO UPDATE SET
+    history = CASE
+      WHEN s.expires_at <= NOW() THEN COALESCE(EXCLUDED.history, '[]'::jsonb)
+      ELSE COALESCE(s.history, '[]'::jsonb) || COALESCE(EXCLUDED.history, '[]'::jsonb)
+    END,
+    summary = CASE WHEN s.expires_at <= NOW() THEN NULL ELSE s.summary END,
+    summary_through = CASE WHEN s.expires_at <= NOW() THEN 0 ELSE s.summary_through END,
+    context = CASE
+      WHEN s.expires_at <= NOW() THEN COALESCE(p_context, '{}'::jsonb)
+      ELSE COALESCE(s.context, '{}'::jsonb) || COALESCE(p_context, '{}'::jsonb)
+    END,
+    expires_at = EXCLUDED.expires_at,
+    last_active = NOW()
+  RETURNING s.session_id, jsonb_array_length(s.history), s.updated_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Return type changes, so the 006 function must be dropped first
+DROP FUNCTION IF EXISTS get_chat_session_recent(UUID, INTEGER);
+
+CREATE OR REPLACE FUNCTION get_chat_session_recent(
+  p_session_id UUID,
+  p_limit INTEGER DEFAULT 40
+)
+RETURNS TABLE (
+  session_id UUID,
+  history JSONB,
+  history_length INTEGER,
+  summary TEXT,
+  summary_through INTEGER,
+  context JSONB,
+  updated_at TIMESTAMP WITH TIME ZONE,
+  expires_at TIMESTAMP WITH TIME ZONE
+) AS $$
+#variable_conflict use_column
+BEGIN
+  RETURN QUERY
+  SELECT
+    s.session_id,
+    COALESCE((
+      SELECT jsonb_agg(t.value ORDER BY t.ord)
+      FROM (
+        SELECT e.value, e.ord
+        FROM jsonb_array_elements(COALESCE(s.history, '[]'::jsonb)) WITH ORDINALITY AS e(value, ord)
+        ORDER BY e.ord DESC
+        LIMIT p_limit
+      ) t
+    ), '[]'::jsonb),
+    jsonb_array_length(COALESCE(s.history, '[]'::jsonb)),
+    s.summary,
+    COALESCE(s.summary_through, 0),
+    COALESCE(s.context, '{}'::jsonb),
+    s.updated_at,
+    s.expires_at
+  FROM chat_sessions s
+  WHERE s.session_id = p_session_id
+    AND s.expires_at > NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Comments for documentation
+COMMENT ON COLUMN chat_sessions.context IS 'Sticky flags from the whole conversation (hasManufacturer, hasSystemType, hasFaultCode, safetyCritical)';
+COMMENT ON FUNCTION append_chat_session_turns IS 'Append messages to chat_sessions.history server-side and merge p_context (upserts the session, restarting expired ones)';
+COMMENT ON FUNCTION get_chat_session_recent IS 'Return a live session with only its last p_limit history entries';
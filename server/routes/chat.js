@@ -22,6 +22,11 @@ const openaiKeys = [
   process.env.OPENAI_API_KEY_3
 ].filter(Boolean);
 
+// Static system prompt, kept free of per-request data so OpenAI prompt caching can reuse it
+const SYSTEM_PROMPT = `You are a professional Gas Safe registered engineer with 20+ years experience. Provide expert diagnostic guidance.
+
+Respond professionally and include safety warnings where appropriate.`;
+
 /**
  * POST /api/v1/chat
  * Standard chat endpoint with database integration
@@ -121,17 +126,8 @@ router.post('/', validateChatMessage, async (req, res) => {
       });
     }
 
-    // Prepare messages for OpenAI
-    const messages = [
-      {
-        role: 'system',
-        content: `You are a professional Gas Safe registered engineer with 20+ years experience. Provide expert diagnostic guidance.
-        
-${relevantKnowledge ? '⚠️ CRITICAL DATABASE INFORMATION:\n' + relevantKnowledge : ''}
-
-Respond professionally and include safety warnings where appropriate.`
-      }
-    ];
+    // Prepare messages for OpenAI: static prompt first, dynamic context last
+    const messages = [{ role: 'system', content: SYSTEM_PROMPT }];
     
     // Add conversation history
     chatHistory.forEach(msg => {
@@ -140,6 +136,10 @@ Respond professionally and include safety warnings where appropriate.`
         content: msg.text
       });
     });
+
+    if (relevantKnowledge) {
+      messages.push({ role: 'system', content: '⚠️ CRITICAL DATABASE INFORMATION:\n' + relevantKnowledge });
+    }
     
     // Call OpenAI with fallback keys
     for (let i = 0; i < openaiKeys.length; i++) {
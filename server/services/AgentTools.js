@@ -2,6 +2,7 @@ import EnhancedFaultCodeService from './EnhancedFaultCodeService.js'
 import { supabase } from '../supabaseClient.js'
 import SessionManager from './SessionManager.js'
 import { embedText } from '../utils/embeddings.js'
+import { ilikeContains, orIlikeContains } from '../utils/postgrestFilter.js'
 
 const AgentTools = {
   _modelTips(manufacturer, model, faultCode) {
@@ -67,9 +68,9 @@ const AgentTools = {
     try {
       let query = supabase.from('boiler_manuals').select('name, url, gc_number, manufacturer')
       if (model) {
-        query = query.or(`manufacturer.ilike.%${manufacturer}%,name.ilike.%${manufacturer}%`).ilike('name', `%${model}%`)
+        query = query.or(orIlikeContains(['manufacturer', 'name'], manufacturer)).ilike('name', ilikeContains(model))
       } else {
-        query = query.or(`manufacturer.ilike.%${manufacturer}%,name.ilike.%${manufacturer}%`)
+        query = query.or(orIlikeContains(['manufacturer', 'name'], manufacturer))
       }
       const { data } = await query.limit(20)
       const itemsRaw = (data || []).map((m) => ({ name: m.name || '', url: m.url, gc_number: m.gc_number || null, manufacturer: m.manufacturer || '' }))
@@ -105,9 +106,9 @@ const AgentTools = {
     const { manufacturer = null, model = null, symptoms = '', limit = 5 } = args || {}
     try {
       let q = supabase.from('symptom_guidance').select('manufacturer, model, symptom, steps')
-      if (manufacturer) q = q.ilike('manufacturer', `%${manufacturer}%`)
-      if (model) q = q.ilike('model', `%${model}%`)
-      if (symptoms) q = q.ilike('symptom', `%${String(symptoms).slice(0, 120)}%`)
+      if (manufacturer) q = q.ilike('manufacturer', ilikeContains(manufacturer))
+      if (model) q = q.ilike('model', ilikeContains(model))
+      if (symptoms) q = q.ilike('symptom', ilikeContains(String(symptoms).slice(0, 120)))
       const { data, error } = await q.limit(Math.max(1, Math.min(10, Number(limit) || 5)))
       if (error) return { items: [] }
       const items = (data || []).map((r) => ({ manufacturer: r.manufacturer, model: r.model, symptom: r.symptom, steps: r.steps }))
@@ -162,7 +163,7 @@ const AgentTools = {
     try {
       if (!fault_code) return { items: [] }
       let q = supabase.from('verified_knowledge').select('*').eq('fault_code', String(fault_code).toUpperCase())
-      if (manufacturer) q = q.ilike('manufacturer', `%${manufacturer}%`)
+      if (manufacturer) q = q.ilike('manufacturer', ilikeContains(manufacturer))
       const { data } = await q.limit(outLimit)
       const items = (data || []).map((r) => ({
         type: 'knowledge',
@@ -182,14 +183,9 @@ const AgentTools = {
   async update_session(args = {}) {
     const { session_id, role = 'assistant', message_text } = args || {}
     if (!session_id || !message_text) return { ok: false }
-    let session = await SessionManager.getSession(session_id)
-    if (!session) {
-      await SessionManager.createSession(session_id, null, [])
-      session = await SessionManager.getSession(session_id)
-    }
-    const history = Array.isArray(session?.history) ? [...session.history] : []
-    history.push({ sender: role === 'user' ? 'user' : 'assistant', text: String(message_text), timestamp: new Date().toISOString() })
-    await SessionManager.updateSession(session_id, history)
+    await SessionManager.appendTurns(session_id, [
+      { sender: role === 'user' ? 'user' : 'assistant', text: String(message_text), timestamp: new Date().toISOString() }
+    ])
     return { ok: true }
   }
 }
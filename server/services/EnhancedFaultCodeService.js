@@ -5,6 +5,7 @@
  */
 
 import { supabase } from '../supabaseClient.js';
+import { ilikeContains } from '../utils/postgrestFilter.js';
 
 class EnhancedFaultCodeService {
   constructor() {
@@ -195,7 +196,7 @@ class EnhancedFaultCodeService {
             .from('boiler_fault_codes')
             .select('*')
             .eq('fault_code', faultCode)
-            .ilike('manufacturer', `%${manufacturer}%`)
+            .ilike('manufacturer', ilikeContains(manufacturer))
             .then(result => ({ source: 'manufacturer_specific', ...result }))
         );
       }
@@ -352,7 +353,7 @@ class EnhancedFaultCodeService {
       const { data, error } = await supabase
         .from('boiler_fault_codes')
         .select('fault_code, description')
-        .ilike('manufacturer', `%${manufacturer}%`)
+        .ilike('manufacturer', ilikeContains(manufacturer))
         .neq('fault_code', faultCode)
         .limit(5);
 
@@ -363,6 +364,37 @@ class EnhancedFaultCodeService {
     }
   }
 
+  /**
+   * Full-text prefilter: best database row for a question about a known fault code.
+   * Requires migration 007 (match_fault_code_fts); returns null when unavailable.
+   * @param {string} userText - Question as typed
+   * @param {Object} scope - { manufacturer, faultCode } to pin the match, plus { model, systemType }
+   *   whose words are left out of the scoring
+   * @returns {Promise<Object|null>} { manufacturer, fault_code, description, solutions, rank } where rank is
+   *   the share (0..1) of the question's descriptive words found in the row
+   */
+  async searchFaultCodeFullText(userText, { manufacturer = null, faultCode = null, model = null, systemType = null } = {}) {
+    try {
+      const { data, error } = await supabase.rpc('match_fault_code_fts', {
+        query_text: String(userText || '').slice(0, 500),
+        p_manufacturer: manufacturer || null,
+        p_fault_code: faultCode || null,
+        p_model: model || null,
+        p_system_type: systemType || null,
+        match_count: 1
+      });
+
+      if (error) {
+        console.error('Fault code full-text search failed:', error.message);
+        return null;
+      }
+      return Array.isArray(data) && data.length > 0 ? data[0] : null;
+    } catch (error) {
+      console.error('Error in fault code full-text search:', error);
+      return null;
+    }
+  }
+
   /**
    * Main method to get comprehensive fault code information for LLM
    */
@@ -0,0 +1,146 @@
+/**
+ * History Summarizer Service
+ * Caps chat history sent to the LLM: the last few messages go verbatim, older
+ * ones are folded into a rolling summary stored on the session
+ */
+
+import fetch from 'node-fetch';
+import SessionManager from './SessionManager.js';
+import { httpsAgent } from '../utils/httpAgent.js';
+import logger from '../utils/logger.js';
+import * as CONSTANTS from '../constants/index.js';
+
+const SUMMARY_PROMPT = `Summarise this boiler troubleshooting conversation for an engineer's assistant.
+Keep: boiler make, model and system type, fault codes, symptoms, checks already done and their results, parts mentioned, and any safety concerns.
+Write plain sentences, under 120 words. Do not add advice.`;
+
+class HistorySummarizer {
+  static RECENT_MESSAGES = CONSTANTS.CHAT_HISTORY_RECENT_MESSAGES;
+  static MAX_VERBATIM_MESSAGES = CONSTANTS.CHAT_HISTORY_MAX_VERBATIM_MESSAGES;
+
+  constructor() {
+    this.inFlight = new Set(); // Session IDs with a summary being generated
+  }
+
+  /**
+   * Summary position for a loaded session
+   * @param {Object|null} session - Session from SessionManager (may hold a recent window only)
+   * @param {number} loadedLength - History entries loaded, before this turn's messages were added
+   * @returns {{summary: string, summaryThrough: number, offset: number, persisted: boolean}}
+   *   offset is the absolute index of history[0]; persisted is false when the history
+   *   did not come from a stored session (nothing to attach a summary to)
+   */
+  contextFor(session, loadedLength) {
+    const total = typeof session?.history_length === 'number' ? session.history_length : loadedLength;
+    return {
+      summary: session?.summary || '',
+      summaryThrough: session?.summary_through || 0,
+      offset: Math.max(0, total - loadedLength),
+      persisted: !!session && loadedLength > 0
+    };
+  }
+
+  /**
+   * Messages to send verbatim plus the summary covering everything before them.
+   * Every message after the summary is sent, so while a new summary is pending
+   * (or has failed) the prompt grows instead of dropping turns, up to the same
+   * window SessionManager loads.
+   * @param {Array} history - Chat history (sender/text entries)
+   * @param {Object} context - From contextFor()
+   * @returns {{summary: string, recent: Array}}
+   */
+  condense(history, context = {}) {
+    const covered = Math.max(0, (context.summaryThrough || 0) - (context.offset || 0));
+    const start = Math.max(covered, history.length - HistorySummarizer.MAX_VERBATIM_MESSAGES);
+    return { summary: context.summary || '', recent: history.slice(start) };
+  }
+
+  /**
+   * Fold aged-out messages into the stored summary once more than 2x the recent
+   * window is unsummarised. Runs in the background; never throws.
+   * When the summary ends before the loaded window (e.g. a long history re-posted
+   * into a new row), the full stored history is read so the gap is folded too.
+   * @param {string} sessionId - Session identifier
+   * @param {Array} history - Chat history including this turn's user message
+   * @param {Object} context - From contextFor()
+   */
+  async refresh(sessionId, history, context = {}) {
+    const k = HistorySummarizer.RECENT_MESSAGES;
+    if (!sessionId || !context.persisted || this.inFlight.has(sessionId)) return false;
+
+    // Absolute positions in the stored history
+    const offset = context.offset || 0;
+    const summaryThrough = context.summaryThrough || 0;
+    if (offset + history.length - summaryThrough <= 2 * k) return false;
+    let foldUntil = offset + history.length - k;
+
+    this.inFlight.add(sessionId);
+    try {
+      let toFold;
+      if (summaryThrough >= offset) {
+        toFold = history.slice(summaryThrough - offset, foldUntil - offset);
+      } else {
+        const session = await SessionManager.getSession(sessionId);
+        const stored = session?.history || [];
+        foldUntil = Math.min(foldUntil, stored.length);
+        toFold = stored.slice(summaryThrough, foldUntil);
+      }
+      if (toFold.length === 0) return false;
+
+      const summary = await this.summarize(context.summary || '', toFold);
+      if (!summary) return false;
+      await SessionManager.saveSummary(sessionId, summary, foldUntil);
+      logger.info(`[HistorySummarizer] Summarised ${toFold.length} messages for session ${sessionId}`);
+      return true;
+    } catch (error) {
+      logger.warn('[HistorySummarizer] refresh failed:', { error: error.message });
+      return false;
+    } finally {
+      this.inFlight.delete(sessionId);
+    }
+  }
+
+  /**
+   * Merge the previous summary and new messages into an updated summary
+   */
+  async summarize(previousSummary, messages) {
+    const transcript = messages
+      .map((m) => `${m.sender === 'user' ? 'Engineer' : 'Assistant'}: ${typeof m?.text === 'string' ? m.text : ''}`)
+      .join('\n');
+    const content = previousSummary
+      ? `Summary so far:\n${previousSummary}\n\nNew messages:\n${transcript}`
+      : transcript;
+
+    const openaiKeys = [
+      process.env.OPENAI_API_KEY,
+      process.env.OPENAI_API_KEY_2,
+      process.env.OPENAI_API_KEY_3
+    ].filter(Boolean);
+
+    for (const key of openaiKeys) {
+      try {
+        const response = await fetch('https://api.openai.com/v1/chat/completions', {
+          method: 'POST',
+          agent: httpsAgent,
+          headers: { 'Authorization': `Bearer ${key}`, 'Content-Type': 'application/json' },
+          body: JSON.stringify({
+            model: 'gpt-4o-mini',
+            messages: [
+              { role: 'system', content: SUMMARY_PROMPT },
+              { role: 'user', content }
+            ],
+            temperature: 0.2,
+            max_tokens: CONSTANTS.CHAT_HISTORY_SUMMARY_MAX_TOKENS
+          })
+        });
+        if (!response.ok) continue;
+        const data = await response.json();
+        const text = data?.choices?.[0]?.message?.content?.trim();
+        if (text) return text;
+      } catch (e) { continue; }
+    }
+    return null;
+  }
+}
+
+export default new HistorySummarizer();
@@ -0,0 +1,93 @@
+/**
+ * Semantic Cache Service
+ * Reuses agent replies for near-duplicate questions via embedding similarity (pgvector)
+ */
+
+import { supabase } from '../supabaseClient.js';
+import { embedText } from '../utils/embeddings.js';
+import logger from '../utils/logger.js';
+
+class SemanticCache {
+  static DEFAULT_THRESHOLD = 0.92;
+  static MAX_AGE_SECONDS = 24 * 60 * 60; // 24 hours
+
+  /**
+   * Semantic cache is opt-in (requires migration 003 and embeddings access)
+   */
+  isEnabled() {
+    return String(process.env.USE_SEMANTIC_CACHE || 'false').toLowerCase() === 'true';
+  }
+
+  get threshold() {
+    return Number(process.env.SEMANTIC_CACHE_THRESHOLD || SemanticCache.DEFAULT_THRESHOLD);
+  }
+
+  /**
+   * Look up the closest cached reply for a question
+   * @param {string} question - User question
+   * @param {Object} scope - { manufacturer, model, faultCode, detailed } exact-match filters
+   * @returns {Promise<{embedding: Array|null, response: Object|null, similarity?: number}>}
+   */
+  async lookup(question, scope = {}) {
+    try {
+      const embedding = await embedText(question);
+      const { data, error } = await supabase.rpc('match_llm_semantic_cache', {
+        query_embedding: embedding,
+        p_manufacturer: scope.manufacturer || null,
+        p_model: scope.model || null,
+        p_fault_code: scope.faultCode || null,
+        p_detailed: !!scope.detailed,
+        max_age_seconds: SemanticCache.MAX_AGE_SECONDS
+      });
+
+      if (error) {
+        logger.warn('[SemanticCache] Lookup failed:', { error: error.message });
+        return { embedding, response: null };
+      }
+
+      const match = Array.isArray(data) ? data[0] : null;
+      if (match && typeof match.similarity === 'number' && match.similarity >= this.threshold) {
+        return { embedding, response: match.response, similarity: match.similarity };
+      }
+      return { embedding, response: null };
+    } catch (error) {
+      logger.warn('[SemanticCache] Lookup error:', { error: error.message });
+      return { embedding: null, response: null };
+    }
+  }
+
+  /**
+   * Store a reply against a question embedding
+   * @param {string} question - User question
+   * @param {Object} scope - { manufacturer, model, faultCode, detailed }
+   * @param {Array} embedding - Embedding returned by lookup()
+   * @param {Object} response - { reply, structured }
+   */
+  async store(question, scope, embedding, response) {
+    if (!embedding) return false;
+    try {
+      const { error } = await supabase
+        .from('llm_semantic_cache')
+        .insert({
+          question: String(question).slice(0, 2000),
+          manufacturer: scope.manufacturer || null,
+          model: scope.model || null,
+          fault_code: scope.faultCode || null,
+          detailed: !!scope.detailed,
+          embedding,
+          response
+        });
+
+      if (error) {
+        logger.warn('[SemanticCache] Store failed:', { error: error.message });
+        return false;
+      }
+      return true;
+    } catch (error) {
+      logger.warn('[SemanticCache] Store error:', { error: error.message });
+      return false;
+    }
+  }
+}
+
+export default new SemanticCache();
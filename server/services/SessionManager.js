@@ -7,7 +7,9 @@ import { supabase } from '../supabaseClient.js';
 
 class SessionManager {
   static SESSION_TIMEOUT = 30 * 60 * 1000; // 30 minutes in milliseconds
-  static fallbackStorage = new Map(); // In-memory fallback
+  static fallbackStorage = new Map(); // In-memory fallback (per process: not shared between cluster workers)
+  static MAX_UPDATE_RETRIES = 3; // Optimistic update attempts before last-writer-wins
+  static RECENT_HISTORY_LIMIT = 40; // History entries loaded by getRecentSession
 
   /**
    * Create a new chat session
@@ -103,52 +105,170 @@ class SessionManager {
   }
 
   /**
-   * Update session with new chat history
+   * Get a session with only its most recent history entries (server-side slice)
+   * @param {string} sessionId - Session identifier
+   * @param {number} limit - Number of trailing history entries to load
+   * @returns {Promise<Object|null>} Session data (with `history_length` of the full history) or null
+   */
+  async getRecentSession(sessionId, limit = SessionManager.RECENT_HISTORY_LIMIT) {
+    if (!sessionId) return null;
+    try {
+      const { data, error } = await supabase.rpc('get_chat_session_recent', {
+        p_session_id: sessionId,
+        p_limit: limit
+      });
+
+      if (!error) {
+        const row = Array.isArray(data) ? data[0] : data;
+        if (row) return row;
+      } else {
+        console.warn('[SessionManager] get_chat_session_recent unavailable, reading full history:', error.message);
+      }
+
+      // Not in the database (or RPC missing): fall back to a full read and slice locally
+      const session = await this.getSession(sessionId);
+      if (!session) return null;
+      const history = session.history || [];
+      return { ...session, history: history.slice(-limit), history_length: history.length };
+    } catch (error) {
+      console.error('[SessionManager] getRecentSession failed:', error);
+      return null;
+    }
+  }
+
+  /**
+   * Append turns to a session's history server-side (JSONB `||`), creating the
+   * session if needed. Only the new turns are sent, not the whole conversation.
+   * @param {string} sessionId - Session identifier
+   * @param {Array} turns - New history entries to append
+   * @param {Object} [options]
+   * @param {Object|null} [options.context] - Conversation flags merged into the row's `context` (migration 008)
+   * @returns {Promise<Object|null>} { session_id, history_length, updated_at } or the fallback session
+   */
+  async appendTurns(sessionId, turns, { context = null } = {}) {
+    if (!sessionId || !Array.isArray(turns) || turns.length === 0) return null;
+    try {
+      const expiresAt = new Date(Date.now() + SessionManager.SESSION_TIMEOUT);
+      const params = {
+        p_session_id: sessionId,
+        p_turns: turns,
+        p_expires_at: expiresAt.toISOString()
+      };
+      if (context) params.p_context = context;
+      const { data, error } = await supabase.rpc('append_chat_session_turns', params);
+
+      if (!error) return Array.isArray(data) ? data[0] : data;
+
+      console.warn('[SessionManager] append_chat_session_turns unavailable, rewriting full history:', error.message);
+      // Read-modify-write, guarded by the optimistic version check
+      const session = await this.getSession(sessionId);
+      const history = session?.history || [];
+      return await this.updateSession(sessionId, [...history, ...turns], {
+        expectedUpdatedAt: session?.metadata?.storage === 'in-memory' ? null : (session?.updated_at || null),
+        baseLength: history.length
+      });
+    } catch (error) {
+      console.error('[SessionManager] appendTurns failed:', error);
+      throw error;
+    }
+  }
+
+  /**
+   * Update session with new chat history, creating the session if it does not exist
+   *
+   * When `expectedUpdatedAt` is given the write is optimistic: it only applies if
+   * no other request has written the session since that version was read. On a
+   * conflict the turns added after `baseLength` are re-applied on top of the
+   * latest stored history, so concurrent turns are not lost.
    * @param {string} sessionId - Session identifier
    * @param {Array} chatHistory - Updated chat history
+   * @param {Object} [options]
+   * @param {string|null} [options.expectedUpdatedAt] - updated_at of the session this history was built from
+   * @param {number} [options.baseLength] - History length at that read
    * @returns {Promise<Object>} Updated session
    */
-  async updateSession(sessionId, chatHistory) {
+  async updateSession(sessionId, chatHistory, { expectedUpdatedAt = null, baseLength = 0 } = {}) {
     try {
-      const expiresAt = new Date(Date.now() + SessionManager.SESSION_TIMEOUT);
-      
-      const { data, error } = await supabase
-        .from('chat_sessions')
-        .update({
-          history: chatHistory,
-          updated_at: new Date().toISOString(),
-          last_active: new Date().toISOString(),
-          expires_at: expiresAt
-        })
-        .eq('session_id', sessionId)
-        .select()
-        .single();
-        
-      if (error) {
-        console.error('[SessionManager] Error updating session in database:', error);
-        console.warn('[SessionManager] Falling back to in-memory storage');
-        // Fallback to in-memory storage
-        const session = {
+      let history = chatHistory;
+      let expected = expectedUpdatedAt;
+
+      for (let attempt = 0; ; attempt++) {
+        const expiresAt = new Date(Date.now() + SessionManager.SESSION_TIMEOUT);
+
+        const row = {
           session_id: sessionId,
-          history: chatHistory,
+          history,
           updated_at: new Date().toISOString(),
           last_active: new Date().toISOString(),
-          expires_at: expiresAt,
-          metadata: {
-            storage: 'in-memory'
-          }
+          expires_at: expiresAt
         };
-        SessionManager.fallbackStorage.set(sessionId, session);
-        return session;
+        // Versioned write updates only the version we read; otherwise a single
+        // upsert creates or replaces the row in one round-trip
+        const query = expected
+          ? supabase.from('chat_sessions').update(row).eq('session_id', sessionId).eq('updated_at', expected)
+          : supabase.from('chat_sessions').upsert(row, { onConflict: 'session_id' });
+
+        const { data, error } = await query.select().maybeSingle();
+
+        if (data) return data;
+
+        if (error || !expected) {
+          if (error) console.error('[SessionManager] Error updating session in database:', error);
+          console.warn('[SessionManager] Falling back to in-memory storage');
+          // Fallback to in-memory storage
+          const session = {
+            session_id: sessionId,
+            history,
+            updated_at: new Date().toISOString(),
+            last_active: new Date().toISOString(),
+            expires_at: expiresAt,
+            metadata: {
+              storage: 'in-memory'
+            }
+          };
+          SessionManager.fallbackStorage.set(sessionId, session);
+          return session;
+        }
+
+        // Version conflict: another request wrote since our read. Rebase our new turns.
+        const latest = await this.getSession(sessionId);
+        const stale = !latest || latest.metadata?.storage === 'in-memory';
+        history = stale ? chatHistory : [...(latest.history || []), ...chatHistory.slice(baseLength)];
+        // Give up on versioning after a few attempts and write last-writer-wins
+        expected = stale || attempt + 1 >= SessionManager.MAX_UPDATE_RETRIES ? null : latest.updated_at;
+        console.warn(`[SessionManager] Session ${sessionId} changed concurrently; retrying update (attempt ${attempt + 1})`);
       }
-      
-      return data;
     } catch (error) {
       console.error('[SessionManager] updateSession failed:', error);
       throw error;
     }
   }
 
+  /**
+   * Store the rolling summary of older history entries
+   * @param {string} sessionId - Session identifier
+   * @param {string} summary - Summary text
+   * @param {number} summaryThrough - Number of leading history entries it covers
+   * @returns {Promise<boolean>} Whether the summary was saved
+   */
+  async saveSummary(sessionId, summary, summaryThrough) {
+    try {
+      const { error } = await supabase
+        .from('chat_sessions')
+        .update({ summary, summary_through: summaryThrough })
+        .eq('session_id', sessionId);
+
+      if (error) {
+        console.error('[SessionManager] Error saving session summary:', error);
+        return false;
+      }
+      return true;
+    } catch (error) {
+      console.error('[SessionManager] saveSummary failed:', error);
+      return false;
+    }
+  }
+
   /**
    * Delete a specific session
    * @param {string} sessionId - Session identifier
@@ -3,6 +3,7 @@ import { createClient } from '@supabase/supabase-js';
 import dotenv from 'dotenv';
 import path from 'path';
 import { fileURLToPath } from 'url';
+import { pooledFetch } from './utils/httpAgent.js';
 
 // Ensure we load env from server/.env, not project root
 const __filename = fileURLToPath(import.meta.url);
@@ -16,6 +17,9 @@ if (!supabaseUrl || !supabaseKey) {
   throw new Error('Missing SUPABASE_URL or SUPABASE_SERVICE_KEY in server/.env');
 }
 
-const supabase = createClient(supabaseUrl, supabaseKey);
+// Route PostgREST/RPC traffic through the shared keep-alive pool
+const supabase = createClient(supabaseUrl, supabaseKey, {
+  global: { fetch: pooledFetch }
+});
 
 export { supabase };
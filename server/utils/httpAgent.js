@@ -0,0 +1,57 @@
+/**
+ * Shared HTTP(S) Agents
+ * Keep-alive connection pools for outbound API calls (OpenAI, Supabase)
+ */
+
+import http from 'http';
+import https from 'https';
+import fetch from 'node-fetch';
+import logger from './logger.js';
+import * as CONSTANTS from '../constants/index.js';
+
+/**
+ * Pooled agent: reuses TLS connections across requests instead of paying a
+ * handshake per call. LIFO scheduling keeps the hottest sockets in use so idle
+ * ones can age out.
+ */
+export const httpsAgent = new https.Agent({
+  keepAlive: true,
+  maxSockets: CONSTANTS.HTTP_POOL_MAX_SOCKETS,
+  maxFreeSockets: CONSTANTS.HTTP_POOL_MAX_FREE_SOCKETS,
+  scheduling: 'lifo'
+});
+
+export const httpAgent = new http.Agent({
+  keepAlive: true,
+  maxSockets: CONSTANTS.HTTP_POOL_MAX_SOCKETS,
+  maxFreeSockets: CONSTANTS.HTTP_POOL_MAX_FREE_SOCKETS,
+  scheduling: 'lifo'
+});
+
+/**
+ * fetch() bound to the pooled agents, for clients that accept a custom fetch
+ * (e.g. supabase-js `global.fetch`)
+ */
+export function pooledFetch(url, options = {}) {
+  return fetch(url, {
+    ...options,
+    agent: (parsedUrl) => (parsedUrl.protocol === 'http:' ? httpAgent : httpsAgent)
+  });
+}
+
+/**
+ * Open pooled connections ahead of the first real request
+ * @param {string} url - Origin to warm (any cheap endpoint; the response is ignored)
+ * @param {number} count - Number of parallel connections to open
+ */
+export async function prewarmConnections(url, count = CONSTANTS.HTTP_POOL_PREWARM_CONNECTIONS) {
+  const t0 = Date.now();
+  const results = await Promise.allSettled(
+    Array.from({ length: count }, () => fetch(url, { method: 'HEAD', agent: httpsAgent }))
+  );
+  const opened = results.filter((r) => r.status === 'fulfilled').length;
+  logger.info(`[HTTP] Pre-warmed ${opened}/${count} connections to ${new URL(url).host} in ${Date.now() - t0}ms`);
+  return opened;
+}
+
+export default httpsAgent;
@@ -0,0 +1,291 @@
+/**
+ * LLM Response Cache
+ * Exact-match cache for OpenAI chat completions, keyed on a SHA-256 hash
+ * of the full request payload (model, messages, tools, sampling params)
+ */
+
+import { createHash } from 'crypto';
+import logger from './logger.js';
+import * as CONSTANTS from '../constants/index.js';
+
+/**
+ * Serialize with sorted object keys so equivalent payloads hash identically
+ */
+function stableStringify(value) {
+  if (Array.isArray(value)) {
+    return `[${value.map((v) => stableStringify(v === undefined ? null : v)).join(',')}]`;
+  }
+  if (value && typeof value === 'object') {
+    const entries = Object.keys(value)
+      .filter((k) => value[k] !== undefined)
+      .sort()
+      .map((k) => `${JSON.stringify(k)}:${stableStringify(value[k])}`);
+    return `{${entries.join(',')}}`;
+  }
+  return JSON.stringify(value);
+}
+
+/**
+ * In-process backend with TTL expiry and LRU eviction
+ */
+export class MemoryBackend {
+  constructor(maxEntries = CONSTANTS.LLM_CACHE_MAX_ENTRIES) {
+    this.store = new Map();
+    this.maxEntries = maxEntries;
+  }
+
+  async get(key) {
+    const item = this.store.get(key);
+    if (!item) return null;
+
+    if (item.expiresAt && Date.now() > item.expiresAt) {
+      this.store.delete(key);
+      return null;
+    }
+
+    // Re-insert to mark as most recently used
+    this.store.delete(key);
+    this.store.set(key, item);
+    return item.value;
+  }
+
+  async set(key, value, ttl) {
+    const expiresAt = ttl ? Date.now() + ttl : null;
+    this.store.delete(key);
+    this.store.set(key, { value, expiresAt });
+
+    // Evict least recently used entries (Map preserves insertion order)
+    while (this.store.size > this.maxEntries) {
+      const oldestKey = this.store.keys().next().value;
+      this.store.delete(oldestKey);
+    }
+    return true;
+  }
+
+  async delete(key) {
+    return this.store.delete(key);
+  }
+
+  async clear() {
+    this.store.clear();
+  }
+
+  async clearExpired() {
+    const now = Date.now();
+    let cleared = 0;
+    for (const [key, item] of this.store.entries()) {
+      if (item.expiresAt && now > item.expiresAt) {
+        this.store.delete(key);
+        cleared++;
+      }
+    }
+    return cleared;
+  }
+
+  get size() {
+    return this.store.size;
+  }
+}
+
+/**
+ * Postgres backend (via Supabase) shared by every server instance and
+ * persisted across restarts. Requires migration 004_create_llm_response_cache.sql
+ */
+export class SupabaseBackend {
+  constructor(client, table = 'llm_response_cache') {
+    this.client = client;
+    this.table = table;
+  }
+
+  async get(key) {
+    const { data, error } = await this.client
+      .from(this.table)
+      .select('value')
+      .eq('cache_key', key)
+      .gt('expires_at', new Date().toISOString())
+      .maybeSingle();
+
+    if (error) throw error;
+    return data ? data.value : null;
+  }
+
+  async set(key, value, ttl) {
+    const expiresAt = new Date(Date.now() + (ttl || CONSTANTS.LLM_CACHE_TTL_MS)).toISOString();
+    const { error } = await this.client
+      .from(this.table)
+      .upsert({ cache_key: key, value, expires_at: expiresAt }, { onConflict: 'cache_key' });
+
+    if (error) throw error;
+    return true;
+  }
+
+  async delete(key) {
+    const { error } = await this.client.from(this.table).delete().eq('cache_key', key);
+    if (error) throw error;
+    return true;
+  }
+
+  async clear() {
+    const { error } = await this.client.from(this.table).delete().neq('cache_key', '');
+    if (error) throw error;
+  }
+
+  async clearExpired() {
+    const { data, error } = await this.client
+      .from(this.table)
+      .delete()
+      .lt('expires_at', new Date().toISOString())
+      .select('cache_key');
+
+    if (error) throw error;
+    return data?.length || 0;
+  }
+
+  get size() {
+    return null; // Not tracked for remote storage
+  }
+}
+
+export class LLMCache {
+  constructor(backend = new MemoryBackend()) {
+    this.backend = backend;
+    this.inFlight = new Map(); // key -> pending completion promise
+    this.stats = {
+      hits: 0,
+      misses: 0,
+      sets: 0,
+      errors: 0,
+      coalesced: 0
+    };
+  }
+
+  /**
+   * Build a cache key from an OpenAI request payload
+   */
+  buildKey(payload) {
+    return createHash('sha256').update(stableStringify(payload)).digest('hex');
+  }
+
+  /**
+   * Only near-deterministic sampling is worth replaying from cache
+   */
+  isCacheable(temperature) {
+    return typeof temperature === 'number' && temperature <= CONSTANTS.LLM_CACHE_MAX_TEMPERATURE;
+  }
+
+  /**
+   * Get cached completion, or null on miss / backend failure
+   */
+  async get(key) {
+    try {
+      const value = await this.backend.get(key);
+      if (value === null || value === undefined) {
+        this.stats.misses++;
+        return null;
+      }
+      this.stats.hits++;
+      return value;
+    } catch (error) {
+      this.stats.errors++;
+      logger.warn('[LLMCache] get failed:', { error: error.message });
+      return null;
+    }
+  }
+
+  /**
+   * Store a completion; failures are logged and never surface to the caller
+   */
+  async set(key, value, ttl = CONSTANTS.LLM_CACHE_TTL_MS) {
+    try {
+      await this.backend.set(key, value, ttl);
+      this.stats.sets++;
+      return true;
+    } catch (error) {
+      this.stats.errors++;
+      logger.warn('[LLMCache] set failed:', { error: error.message });
+      return false;
+    }
+  }
+
+  /**
+   * Single-flight: concurrent callers with the same key share one pending call
+   * instead of each hitting the API before the cache is populated
+   * @param {string} key - Cache key from buildKey()
+   * @param {Function} fn - Async producer, invoked at most once per key at a time
+   */
+  async singleFlight(key, fn) {
+    const pending = this.inFlight.get(key);
+    if (pending) {
+      this.stats.coalesced++;
+      return pending;
+    }
+
+    const promise = (async () => {
+      try {
+        return await fn();
+      } finally {
+        this.inFlight.delete(key);
+      }
+    })();
+    this.inFlight.set(key, promise);
+    return promise;
+  }
+
+  /**
+   * Whether the backend is shared between processes (cleanup should run in one of them)
+   */
+  get isShared() {
+    return !(this.backend instanceof MemoryBackend);
+  }
+
+  /**
+   * Remove expired entries from the backend
+   */
+  async clearExpired() {
+    try {
+      const cleared = await this.backend.clearExpired();
+      if (cleared > 0) {
+        logger.info(`[LLMCache] Cleared ${cleared} expired items`);
+      }
+      return cleared;
+    } catch (error) {
+      logger.warn('[LLMCache] clearExpired failed:', { error: error.message });
+      return 0;
+    }
+  }
+
+  /**
+   * Get cache statistics
+   */
+  getStats() {
+    const lookups = this.stats.hits + this.stats.misses;
+    const hitRate = lookups > 0 ? (this.stats.hits / lookups * 100).toFixed(2) : 0;
+
+    return {
+      backend: this.backend.constructor.name,
+      size: this.backend.size,
+      inFlight: this.inFlight.size,
+      hitRate: `${hitRate}%`,
+      ...this.stats
+    };
+  }
+}
+
+// Create singleton instance
+const llmCache = new LLMCache();
+
+/**
+ * Select the process-wide cache backend. Call once at startup, after env is loaded.
+ * LLM_CACHE_BACKEND=supabase shares the cache across instances; default is in-process memory.
+ */
+export function configureLLMCache({ backend = process.env.LLM_CACHE_BACKEND || 'memory', client = null } = {}) {
+  if (String(backend).toLowerCase() === 'supabase' && client) {
+    llmCache.backend = new SupabaseBackend(client);
+  } else {
+    llmCache.backend = new MemoryBackend();
+  }
+  logger.info(`[LLMCache] Using ${llmCache.backend.constructor.name}`);
+  return llmCache;
+}
+
+export default llmCache;
@@ -0,0 +1,57 @@
+/**
+ * PostgREST Filter Builders
+ * Build ilike patterns and or() filter strings from untrusted text without
+ * string-splicing it into the filter grammar
+ */
+
+/**
+ * Escape LIKE wildcards so the value matches literally. PostgREST also reads `*`
+ * as `%` in like/ilike patterns and has no escape for it, so `*` is removed.
+ * @param {string} value - Raw text
+ * @returns {string} Text with \, % and _ escaped and * removed
+ */
+export function escapeLike(value) {
+  return String(value ?? '').replace(/\*/g, '').replace(/[\\%_]/g, '\\$&');
+}
+
+/**
+ * "Contains" pattern for .ilike(column, pattern)
+ * @param {string} value - Raw text
+ * @returns {string} %value% with wildcards escaped
+ */
+export function ilikeContains(value) {
+  return `%${escapeLike(value)}%`;
+}
+
+/**
+ * Quote a value for use inside an or()/and() filter string. Commas, dots,
+ * colons and parentheses are filter syntax, so the value is always
+ * double-quoted with embedded quotes and backslashes escaped.
+ * @param {string} value - Filter value
+ * @returns {string} Quoted value
+ */
+export function quoteFilterValue(value) {
+  return `"${String(value ?? '').replace(/["\\]/g, '\\$&')}"`;
+}
+
+/**
+ * or() filter matching rows where any column contains the value (case-insensitive)
+ * @param {Array<string>} columns - Column names
+ * @param {string} value - Raw text to search for
+ * @returns {string} e.g. manufacturer.ilike."%ideal%",name.ilike."%ideal%"
+ */
+export function orIlikeContains(columns, value) {
+  const pattern = quoteFilterValue(ilikeContains(value));
+  return columns.map((column) => `${column}.ilike.${pattern}`).join(',');
+}
+
+/**
+ * or() filter from explicit [column, value] pairs, each a case-insensitive contains match
+ * @param {Array<[string, string]>} pairs - Column/value pairs
+ * @returns {string} Filter string for .or()
+ */
+export function orIlikeContainsEach(pairs) {
+  return pairs
+    .map(([column, value]) => `${column}.ilike.${quoteFilterValue(ilikeContains(value))}`)
+    .join(',');
+}